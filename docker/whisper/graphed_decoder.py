@@ -0,0 +1,195 @@
+"""
+CUDA-graph greedy decoder for the openai Whisper backend
+Re-implements one Whisper decoder step over fixed-size KV buffers so the
+whole step (every block's attention, cross-attention and MLP kernels) can
+be captured once as a CUDA graph and replayed per token.
+
+Whisper's own decoder grows its KV cache with torch.cat inside forward
+hooks, which allocates new tensors each step and cannot be captured.
+Here the self-attention cache is preallocated to the full text context,
+the current position is a device tensor, and future slots are masked.
+"""
+
+import logging
+from typing import List, Optional
+
+import torch
+import torch.nn.functional as F
+import whisper
+from whisper.tokenizer import get_tokenizer
+from whisper.utils import compression_ratio
+
+logger = logging.getLogger(__name__)
+
+
+class GraphedGreedyDecoder:
+    """Temperature-0 decoding of up to batch_size 30-s windows with graph replay"""
+
+    def __init__(self, model, batch_size: int):
+        self.model = model
+        # torch.compile wraps the module; the graph needs the raw submodules
+        self.decoder = getattr(model.decoder, "_orig_mod", model.decoder)
+        self.batch_size = batch_size
+        self.n_ctx, n_state = self.decoder.positional_embedding.shape
+        self.n_head = self.decoder.blocks[0].attn.n_head
+        self.sample_len = self.n_ctx // 2
+
+        weight = self.decoder.token_embedding.weight
+        device, self.dtype = weight.device, weight.dtype
+
+        def kv_buffer(length: int) -> torch.Tensor:
+            return torch.zeros(batch_size, length, n_state, device=device, dtype=self.dtype)
+
+        n_audio_ctx = model.dims.n_audio_ctx
+        self.self_k = [kv_buffer(self.n_ctx) for _ in self.decoder.blocks]
+        self.self_v = [kv_buffer(self.n_ctx) for _ in self.decoder.blocks]
+        self.cross_k = [kv_buffer(n_audio_ctx) for _ in self.decoder.blocks]
+        self.cross_v = [kv_buffer(n_audio_ctx) for _ in self.decoder.blocks]
+
+        # Static graph inputs, rewritten in place before every replay
+        self.tokens = torch.zeros(batch_size, dtype=torch.long, device=device)
+        self.position = torch.zeros(1, dtype=torch.long, device=device)
+        self.positions = torch.arange(self.n_ctx, device=device)
+
+        # Same suppression DecodingTask applies with suppress_tokens="-1"
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages)
+        self.eot = tokenizer.eot
+        self.no_speech = tokenizer.no_speech
+        suppressed = set(tokenizer.non_speech_tokens) | {
+            tokenizer.transcribe, tokenizer.translate, tokenizer.sot, tokenizer.sot_prev, tokenizer.sot_lm
+        }
+        if tokenizer.no_speech is not None:
+            suppressed.add(tokenizer.no_speech)
+        n_vocab = self.decoder.token_embedding.num_embeddings
+        self.suppress = torch.zeros(n_vocab, device=device)
+        self.suppress[sorted(suppressed)] = -float("inf")
+        self.suppress_blank = self.suppress.clone()
+        self.suppress_blank[tokenizer.encode(" ") + [tokenizer.eot]] = -float("inf")
+
+        self.graph, self.logits = self._capture()
+        logger.info(f"Captured CUDA graph for Whisper decoder step (batch {batch_size})")
+
+    def _attend(self, q: torch.Tensor, k: torch.Tensor, v: torch.Tensor,
+                mask: Optional[torch.Tensor]) -> torch.Tensor:
+        batch = q.shape[0]
+
+        def heads(x: torch.Tensor) -> torch.Tensor:
+            return x.view(batch, x.shape[1], self.n_head, -1).transpose(1, 2)
+
+        out = F.scaled_dot_product_attention(heads(q), heads(k), heads(v), attn_mask=mask)
+        return out.transpose(1, 2).reshape(batch, q.shape[1], -1)
+
+    def _step(self) -> torch.Tensor:
+        """One decoder position for the whole batch; returns (batch, vocab) logits"""
+        decoder = self.decoder
+        x = decoder.token_embedding(self.tokens).unsqueeze(1)
+        x = (x + decoder.positional_embedding.index_select(0, self.position)).to(self.dtype)
+        # Slots past the current position hold stale keys from earlier batches
+        mask = (self.positions <= self.position).view(1, 1, 1, -1)
+
+        for i, block in enumerate(decoder.blocks):
+            h = block.attn_ln(x)
+            self.self_k[i].index_copy_(1, self.position, block.attn.key(h))
+            self.self_v[i].index_copy_(1, self.position, block.attn.value(h))
+            x = x + block.attn.out(self._attend(block.attn.query(h), self.self_k[i], self.self_v[i], mask))
+
+            h = block.cross_attn_ln(x)
+            x = x + block.cross_attn.out(self._attend(block.cross_attn.query(h), self.cross_k[i], self.cross_v[i], None))
+            x = x + block.mlp(block.mlp_ln(x))
+
+        x = decoder.ln(x)
+        return (x[:, 0] @ decoder.token_embedding.weight.to(x.dtype).T).float()
+
+    @torch.no_grad()
+    def _capture(self):
+        # Warm up on a side stream so lazy cuBLAS/SDPA initialisation is not recorded
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(3):
+                self._step()
+        torch.cuda.current_stream().wait_stream(stream)
+
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            logits = self._step()
+        return graph, logits
+
+    def _replay(self, tokens: torch.Tensor, position: int) -> torch.Tensor:
+        self.tokens.copy_(tokens)
+        self.position.fill_(position)
+        self.graph.replay()
+        return self.logits
+
+    @torch.no_grad()
+    def decode(self, audio_features: torch.Tensor, language: Optional[str], task: str) -> List[whisper.DecodingResult]:
+        """Greedy-decode encoded windows, numerically matching whisper.decode at temperature 0"""
+        n = audio_features.shape[0]
+        if n > self.batch_size:
+            raise ValueError(f"Batch of {n} exceeds captured size {self.batch_size}")
+
+        if language is not None:
+            languages = [language] * n
+        elif self.model.is_multilingual:
+            _, probs = self.model.detect_language(audio_features)
+            languages = [max(p, key=p.get) for p in probs]
+        else:
+            languages = ["en"] * n
+
+        # Cross-attention K/V are projected once per window, outside the graph.
+        # Rows past n keep stale values; their outputs are never read
+        xa = audio_features.to(self.dtype)
+        for i, block in enumerate(self.decoder.blocks):
+            self.cross_k[i][:n].copy_(block.cross_attn.key(xa))
+            self.cross_v[i][:n].copy_(block.cross_attn.value(xa))
+
+        tokenizers = [
+            get_tokenizer(self.model.is_multilingual, num_languages=self.model.num_languages,
+                          language=lang, task=task)
+            for lang in languages
+        ]
+        prompts = [list(t.sot_sequence_including_notimestamps) for t in tokenizers]
+        prompts += [prompts[0]] * (self.batch_size - n)
+        prompt = torch.tensor(prompts, device=self.tokens.device)
+        prompt_length = prompt.shape[1]
+
+        no_speech_probs = [float("nan")] * n
+        for j in range(prompt_length):
+            logits = self._replay(prompt[:, j], j)
+            if j == 0 and self.no_speech is not None:
+                no_speech_probs = logits[:n].softmax(dim=-1)[:, self.no_speech].tolist()
+
+        finished = torch.zeros(self.batch_size, dtype=torch.bool, device=self.tokens.device)
+        sum_logprobs = torch.zeros(self.batch_size, device=self.tokens.device)
+        generated = []
+        for step in range(self.sample_len):
+            suppress = self.suppress_blank if step == 0 else self.suppress
+            logprobs = F.log_softmax(logits + suppress, dim=-1)
+            next_tokens = logprobs.argmax(dim=-1)
+            current = logprobs.gather(1, next_tokens[:, None]).squeeze(1)
+            sum_logprobs += torch.where(finished, torch.zeros_like(current), current)
+            next_tokens = torch.where(finished, torch.full_like(next_tokens, self.eot), next_tokens)
+            generated.append(next_tokens)
+            finished |= next_tokens == self.eot
+
+            if bool(finished[:n].all()) or prompt_length + step >= self.n_ctx:
+                break
+            logits = self._replay(next_tokens, prompt_length + step)
+
+        rows = torch.stack(generated, dim=1)[:n].tolist()
+        sums = sum_logprobs[:n].tolist()
+        results = []
+        for i, (row, tokenizer) in enumerate(zip(rows, tokenizers)):
+            tokens = row[:row.index(self.eot)] if self.eot in row else row
+            text = tokenizer.decode(tokens).strip()
+            results.append(whisper.DecodingResult(
+                audio_features=audio_features[i],
+                language=languages[i],
+                tokens=tokens,
+                text=text,
+                avg_logprob=sums[i] / (len(tokens) + 1),
+                no_speech_prob=no_speech_probs[i],
+                temperature=0.0,
+                compression_ratio=compression_ratio(text)
+            ))
+        return results
@@ -0,0 +1,249 @@
+"""
+ONNX Runtime Whisper backend for the local Whisper server
+Runs exported Whisper encoder/decoder graphs on any ONNX Runtime execution
+provider (DirectML, CUDA, CPU), so DX12 GPUs are accelerated without CUDA.
+
+On CUDA, when decoder_with_past_model.onnx is present, decoding uses IO
+binding so the encoder output and KV cache stay resident in GPU memory.
+
+Export once, offline:
+    optimum-cli export onnx --model openai/whisper-base whisper-base-onnx/
+    python -m onnxruntime.transformers.optimizer \\
+        --input whisper-base-onnx/encoder_model.onnx \\
+        --output whisper-base-onnx/encoder_model.onnx \\
+        --model_type bart --use_multi_head_attention
+
+For CPU-only hosts, also write dynamically quantized int8 copies, loaded
+as *_quantized.onnx (CPUs with VNNI run the int8 matmuls natively):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    for name in ("encoder_model", "decoder_model"):
+        quantize_dynamic(f"whisper-base-onnx/{name}.onnx",
+                         f"whisper-base-onnx/{name}_quantized.onnx",
+                         weight_type=QuantType.QInt8)
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import onnxruntime as ort
+import whisper
+from whisper.audio import FRAMES_PER_SECOND, N_FRAMES
+from whisper.tokenizer import Tokenizer, get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# Whisper never emits more than half its 448-token text context per window
+MAX_DECODE_TOKENS = 224
+
+# File suffix of the int8 models produced by quantize_dynamic
+QUANTIZED_SUFFIX = "_quantized"
+
+
+class OnnxWhisper:
+    """Greedy Whisper decoder driven by ONNX Runtime sessions"""
+
+    def __init__(self,
+                 model_dir: str,
+                 providers: list,
+                 multilingual: bool = True,
+                 sess_options: Optional[ort.SessionOptions] = None,
+                 quantized: bool = False):
+        self.multilingual = multilingual
+        suffix = QUANTIZED_SUFFIX if quantized else ""
+        self.encoder = ort.InferenceSession(
+            os.path.join(model_dir, f"encoder_model{suffix}.onnx"),
+            sess_options=sess_options,
+            providers=providers
+        )
+        self.decoder = ort.InferenceSession(
+            os.path.join(model_dir, f"decoder_model{suffix}.onnx"),
+            sess_options=sess_options,
+            providers=providers
+        )
+
+        # Cached decoder: with IO binding only the next token id goes to the GPU
+        self.decoder_with_past: Optional[ort.InferenceSession] = None
+        with_past_path = os.path.join(model_dir, "decoder_with_past_model.onnx")
+        if "CUDAExecutionProvider" in self.encoder.get_providers() and os.path.exists(with_past_path):
+            self.decoder_with_past = ort.InferenceSession(
+                with_past_path,
+                sess_options=sess_options,
+                providers=providers
+            )
+            self._decoder_outputs = [output.name for output in self.decoder.get_outputs()]
+            self._with_past_inputs = {item.name for item in self.decoder_with_past.get_inputs()}
+            self._with_past_outputs = [output.name for output in self.decoder_with_past.get_outputs()]
+            logger.info("ONNX Whisper decoding with IO binding and KV cache on CUDA")
+
+        # large-v3 uses 128 mel bins; symbolic dims fall back to the classic 80
+        n_mels = self.encoder.get_inputs()[0].shape[1]
+        self.n_mels = n_mels if isinstance(n_mels, int) else 80
+
+        # Token suppression is language-independent, so build the mask once
+        tokenizer = get_tokenizer(multilingual)
+        self._suppress = np.array(
+            sorted(set(tokenizer.non_speech_tokens) | {
+                tokenizer.sot,
+                tokenizer.sot_prev,
+                tokenizer.sot_lm,
+                tokenizer.no_speech,
+                tokenizer.no_timestamps,
+                tokenizer.translate,
+                tokenizer.transcribe,
+            }),
+            dtype=np.int64
+        )
+        self._timestamp_begin = tokenizer.timestamp_begin
+        self._initial_suppress = np.array(tokenizer.encode(" ") + [tokenizer.eot], dtype=np.int64)
+
+        logger.info(
+            f"ONNX Whisper sessions created with providers: {self.encoder.get_providers()}"
+            f"{' (int8 quantized)' if quantized else ''}"
+        )
+
+    def transcribe(self, audio, language: Optional[str] = None, task: str = "transcribe") -> dict:
+        """Transcribe a file path or 16 kHz float32 waveform, one 30-s window at a time"""
+        mel = whisper.log_mel_spectrogram(audio, n_mels=self.n_mels)
+        n_frames = mel.shape[-1]
+
+        segments: List[Dict] = []
+        for seek in range(0, max(n_frames, 1), N_FRAMES):
+            segment_mel = whisper.pad_or_trim(mel[:, seek:seek + N_FRAMES], N_FRAMES)
+            features = segment_mel.numpy()[np.newaxis].astype(np.float32)
+
+            if language is None and not self.multilingual:
+                language = "en"
+
+            # Encoder output is computed once per window and reused by every decode step
+            if self.decoder_with_past is not None:
+                encoder_hidden_states = self._encode_on_device(features)
+                if language is None:
+                    language = self._detect_language(encoder_hidden_states.numpy())
+                tokenizer = get_tokenizer(self.multilingual, language=language, task=task)
+                tokens = self._decode_with_past(encoder_hidden_states, tokenizer)
+            else:
+                encoder_hidden_states = self.encoder.run(None, {"input_features": features})[0]
+                if language is None:
+                    language = self._detect_language(encoder_hidden_states)
+                tokenizer = get_tokenizer(self.multilingual, language=language, task=task)
+                tokens = self._decode(encoder_hidden_states, tokenizer)
+            segments.append({
+                "id": len(segments),
+                "seek": seek,
+                "start": seek / FRAMES_PER_SECOND,
+                "end": min(seek + N_FRAMES, n_frames) / FRAMES_PER_SECOND,
+                "text": tokenizer.decode(tokens),
+                "tokens": tokens,
+                "temperature": 0.0
+            })
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "language": language,
+            "segments": segments
+        }
+
+    def _next_token_logits(self, tokens: List[int], encoder_hidden_states: np.ndarray) -> np.ndarray:
+        """Run the decoder over the token prefix and return logits for the next position"""
+        logits = self.decoder.run(
+            ["logits"],
+            {
+                "input_ids": np.array([tokens], dtype=np.int64),
+                "encoder_hidden_states": encoder_hidden_states
+            }
+        )[0]
+        return logits[0, -1]
+
+    def _detect_language(self, encoder_hidden_states: np.ndarray) -> str:
+        """Pick the most likely language token after start-of-transcript"""
+        tokenizer = get_tokenizer(self.multilingual)
+        logits = self._next_token_logits([tokenizer.sot], encoder_hidden_states)
+        language_tokens = np.array(tokenizer.all_language_tokens)
+        best = int(language_tokens[logits[language_tokens].argmax()])
+        return tokenizer.all_language_codes[tokenizer.all_language_tokens.index(best)]
+
+    def _select_token(self, logits: np.ndarray, first_step: bool) -> int:
+        """Greedy pick with Whisper's timestamp-free suppression rules"""
+        logits[self._suppress] = -np.inf
+        logits[self._timestamp_begin:] = -np.inf
+        if first_step:
+            logits[self._initial_suppress] = -np.inf
+        return int(logits.argmax())
+
+    def _decode(self, encoder_hidden_states: np.ndarray, tokenizer: Tokenizer) -> List[int]:
+        """Greedy, timestamp-free decode of a single window"""
+        tokens = list(tokenizer.sot_sequence_including_notimestamps)
+        prompt_length = len(tokens)
+
+        for _ in range(MAX_DECODE_TOKENS):
+            logits = self._next_token_logits(tokens, encoder_hidden_states)
+            next_token = self._select_token(logits, len(tokens) == prompt_length)
+            if next_token == tokenizer.eot:
+                break
+            tokens.append(next_token)
+
+        return tokens[prompt_length:]
+
+    def _encode_on_device(self, features: np.ndarray) -> ort.OrtValue:
+        """Run the encoder, leaving its output in GPU memory"""
+        binding = self.encoder.io_binding()
+        binding.bind_cpu_input("input_features", features)
+        binding.bind_output(self.encoder.get_outputs()[0].name, "cuda")
+        self.encoder.run_with_iobinding(binding)
+        return binding.get_outputs()[0]
+
+    def _run_bound(self, session: ort.InferenceSession, output_names: List[str],
+                   input_ids: np.ndarray, device_inputs: Dict[str, ort.OrtValue]) -> Dict[str, ort.OrtValue]:
+        """Run one decoder step; KV tensors stay on the GPU, only logits come back"""
+        binding = session.io_binding()
+        binding.bind_cpu_input("input_ids", input_ids)
+        for name, value in device_inputs.items():
+            binding.bind_ortvalue_input(name, value)
+        for name in output_names:
+            binding.bind_output(name, "cpu" if name == "logits" else "cuda")
+        session.run_with_iobinding(binding)
+        return dict(zip(output_names, binding.get_outputs()))
+
+    def _decode_with_past(self, encoder_hidden_states: ort.OrtValue, tokenizer: Tokenizer) -> List[int]:
+        """Greedy decode reusing device-resident KV cache between steps"""
+        tokens = list(tokenizer.sot_sequence_including_notimestamps)
+        prompt_length = len(tokens)
+
+        # The first pass over the prompt also yields the cross-attention K/V,
+        # which stay fixed for the rest of the window
+        outputs = self._run_bound(
+            self.decoder,
+            self._decoder_outputs,
+            np.array([tokens], dtype=np.int64),
+            {"encoder_hidden_states": encoder_hidden_states}
+        )
+
+        for _ in range(MAX_DECODE_TOKENS):
+            past = {
+                name.replace("present", "past_key_values"): value
+                for name, value in outputs.items()
+                if name != "logits"
+            }
+            past["encoder_hidden_states"] = encoder_hidden_states
+            logits = outputs["logits"].numpy()[0, -1]
+            next_token = self._select_token(logits, len(tokens) == prompt_length)
+            if next_token == tokenizer.eot:
+                break
+            tokens.append(next_token)
+
+            step_outputs = self._run_bound(
+                self.decoder_with_past,
+                self._with_past_outputs,
+                np.array([[next_token]], dtype=np.int64),
+                {name: value for name, value in past.items() if name in self._with_past_inputs}
+            )
+            # Only self-attention K/V grow; keep the cached cross-attention entries
+            outputs = {
+                **{name.replace("past_key_values", "present"): value
+                   for name, value in past.items() if name.startswith("past_key_values")},
+                **step_outputs
+            }
+
+        return tokens[prompt_length:]
@@ -1,36 +1,177 @@
 #!/usr/bin/env python3
 """
 Local Whisper Server for Windows AI Assistant
-Provides speech-to-text API using OpenAI Whisper models
+Provides speech-to-text API using Whisper models
+
+Backends (WHISPER_BACKEND):
+- faster-whisper: CTranslate2 runtime with int8 quantization (default when installed)
+- openai: reference PyTorch implementation
+- onnx: exported graphs on ONNX Runtime (DirectML / CUDA / CPU execution providers)
 """
 
 import os
+import shutil
 import tempfile
 import logging
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 from contextlib import asynccontextmanager
-import whisper
+from dataclasses import asdict
+
+# Cap the OpenMP/MKL pools before numpy and torch create them, so several
+# workers on one node do not each spawn a thread per core
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", str(min(os.cpu_count() or 1, 4))))
+os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(TORCH_THREADS))
+
+import numpy as np
 import torch
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 import uvicorn
-import aiofiles
+
+# CTranslate2 runtime - preferred backend
+try:
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
+# Reference PyTorch implementation - fallback backend
+try:
+    import whisper
+    from graphed_decoder import GraphedGreedyDecoder
+    OPENAI_WHISPER_AVAILABLE = True
+except ImportError:
+    OPENAI_WHISPER_AVAILABLE = False
+
+# ONNX Runtime - DirectML acceleration for DX12 GPUs without CUDA
+try:
+    import onnxruntime as ort
+    from onnx_whisper import OnnxWhisper, QUANTIZED_SUFFIX
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# In-process audio decoding - skips the temp file and ffmpeg subprocess
+try:
+    import soundfile as sf
+    import torchaudio
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
+# libuv-based event loop for the socket-heavy upload path
+try:
+    import uvloop  # noqa: F401
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upload copy granularity (1 MiB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Whisper models consume 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Only sample layout accepted by /transcribe/pcm
+PCM_FORMAT = "s16le"
+
+
+class CachedEncoder(torch.nn.Module):
+    """Whisper audio encoder that reuses its output for a repeated mel segment"""
+    
+    def __init__(self, encoder: torch.nn.Module):
+        super().__init__()
+        self.encoder = encoder
+        # (base tensor, input key, output), swapped as one tuple so readers on
+        # other executor threads never see a mismatched pair
+        self._cache = None
+    
+    def forward(self, mel: torch.Tensor) -> torch.Tensor:
+        # whisper.transcribe retries a window at higher temperatures with the
+        # same mel segment, but whisper.decode re-wraps it with unsqueeze(0)
+        # each time, so the tensor object differs. The key is therefore the
+        # view of storage it reads; holding the base tensor keeps that
+        # storage alive, so its address can't be handed to a new tensor.
+        # Inference tensors carry no version counter; whisper never writes
+        # to a mel segment in place, so the view alone is enough for them
+        key = (
+            mel.data_ptr(), mel.shape, mel.stride(), mel.dtype, mel.device,
+            None if mel.is_inference() else mel._version
+        )
+        cache = self._cache
+        if cache is not None and cache[1] == key:
+            return cache[2]
+        
+        output = self.encoder(mel)
+        self._cache = (mel if mel._base is None else mel._base, key, output)
+        return output
+
 class WhisperServer:
     def __init__(self):
         self.model = None
         self.model_name = os.getenv("WHISPER_MODEL", "base")
         # Use CUDA (ROCm) if available, fallback to CPU
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        torch.set_num_threads(TORCH_THREADS)
+        try:
+            # Inference is one op after another; extra inter-op threads only contend
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Already fixed once parallel work has run in this process
+            pass
         self.language = os.getenv("WHISPER_LANGUAGE", "en")
+        # Same variables as the assistant's AssistantSettings, so one .env serves both
+        self.use_directml = os.getenv("USE_DIRECTML", "true").lower() in ("1", "true", "yes")
+        self.directml_device_id = int(os.getenv("DIRECTML_DEVICE_ID", "0"))
+        self.onnx_dir = os.getenv(
+            "WHISPER_ONNX_DIR",
+            str(Path(__file__).parent / "models" / f"whisper-{self.model_name}-onnx")
+        )
+        # Device-ready state dicts from earlier boots (openai backend)
+        self.cache_dir = Path(os.getenv("WHISPER_CACHE_DIR", str(Path(__file__).parent / "cache")))
+        self.backend = self._select_backend()
+        # int8 weights with FP16 activations on GPU, pure int8 on CPU
+        self.compute_type = os.getenv(
+            "WHISPER_COMPUTE_TYPE",
+            "int8_float16" if self.device == "cuda" else "int8"
+        )
+        # Half precision halves weight traffic on GPU; CPU kernels stay FP32
+        self.fp16 = self.device == "cuda" and os.getenv("WHISPER_FP16", "1") != "0"
+        # Graph optimisation for the openai backend: "compile", "script" or "none".
+        # torch.compile needs PyTorch 2.1+ and a GPU for CUDA graph capture
+        torch_version = tuple(int(part) for part in torch.__version__.split("+")[0].split(".")[:2])
+        self.can_compile = hasattr(torch, "compile") and torch_version >= (2, 1)
+        self.jit_mode = os.getenv(
+            "WHISPER_JIT",
+            "compile" if self.device == "cuda" and self.can_compile else "script"
+        )
         
-        logger.info(f"Initializing Whisper Server with device: {self.device}")
+        # Micro-batching of short clips (openai backend): up to max_batch
+        # requests arriving within batch_window share one encoder pass.
+        # Batched results are greedy, timestamp-free decodes with a single
+        # segment per clip; a clip that arrives alone is transcribed normally
+        self.max_batch = int(os.getenv("WHISPER_MAX_BATCH", "4"))
+        self.batch_window = float(os.getenv("WHISPER_BATCH_WINDOW_MS", "20")) / 1000
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        # Opt-in: replay batched decoder steps from a captured CUDA graph
+        self.cuda_graphs = self.device == "cuda" and os.getenv("WHISPER_CUDA_GRAPHS", "0") == "1"
+        self._graph_decoder: Optional["GraphedGreedyDecoder"] = None
+        # Every model call goes through one thread: concurrent requests queue
+        # here instead of contending for the CUDA context and VRAM
+        self._gpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper-gpu")
+        # Created once; the ffmpeg fallback writes uniquely named files into it
+        self._tmpdir = Path(tempfile.mkdtemp(prefix="whisper_"))
+        
+        logger.info(f"Initializing Whisper Server with device: {self.device}, backend: {self.backend}")
         if self.device == "cuda":
             logger.info(f"GPU detected: {torch.cuda.get_device_name(0)}")
         
@@ -39,6 +180,8 @@ class WhisperServer:
             title="Windows AI Whisper Server",
             description="Speech-to-text API using OpenAI Whisper with GPU acceleration",
             version="1.0.0",
+            # orjson serialises long segment lists far faster than stdlib json
+            default_response_class=ORJSONResponse,
             lifespan=self.lifespan
         )
         
@@ -49,9 +192,19 @@ class WhisperServer:
     async def lifespan(self, app: FastAPI):
         # Startup
         await self.load_model()
+        if self.backend == "openai" and (self.max_batch > 1 or self._graph_decoder):
+            self._batch_queue = asyncio.Queue()
+            self._batch_task = asyncio.create_task(self._batch_loop())
         yield
-        # Shutdown (cleanup if needed)
-        pass
+        # Shutdown
+        if self._batch_task:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+        self._gpu_executor.shutdown(wait=True)
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
         
     def setup_routes(self):
         """Setup FastAPI routes"""
@@ -59,25 +212,27 @@ class WhisperServer:
         @self.app.get("/health")
         async def health_check():
             """Health check endpoint"""
-            return JSONResponse({
+            return {
                 "status": "healthy",
                 "model": self.model_name,
                 "device": self.device,
+                "backend": self.backend,
                 "model_loaded": self.model is not None
-            })
+            }
         
         @self.app.get("/")
         async def root():
             """Root endpoint with server info"""
-            return JSONResponse({
+            return {
                 "message": "Local Whisper Server",
                 "model": self.model_name,
                 "device": self.device,
                 "endpoints": {
                     "transcribe": "/transcribe",
+                    "transcribe_pcm": "/transcribe/pcm",
                     "health": "/health"
                 }
-            })
+            }
         
         @self.app.post("/transcribe")
         async def transcribe_audio(
@@ -93,28 +248,91 @@ class WhisperServer:
             if not file.content_type or not file.content_type.startswith('audio/'):
                 raise HTTPException(status_code=400, detail="File must be an audio file")
             
+            loop = asyncio.get_event_loop()
+            audio = None
+            temp_file = None
             try:
-                # Save uploaded file temporarily
-                temp_dir = Path("/app/audio_temp")
-                temp_dir.mkdir(exist_ok=True)
-                
-                temp_file = temp_dir / f"temp_{file.filename}"
+                # Decode straight from the upload spool for formats libsndfile reads
+                if SOUNDFILE_AVAILABLE:
+                    try:
+                        audio = await loop.run_in_executor(None, self._decode_audio, file.file)
+                    except RuntimeError as e:
+                        logger.debug(f"In-process decode failed, using ffmpeg: {e}")
+                        await file.seek(0)
                 
-                async with aiofiles.open(temp_file, 'wb') as f:
-                    content = await file.read()
-                    await f.write(content)
+                if audio is None:
+                    # Save uploaded file temporarily for ffmpeg. The client's
+                    # filename only contributes its extension, as a format hint
+                    suffix = Path(file.filename or "").suffix
+                    if not suffix[1:].isalnum():
+                        suffix = ""
+                    
+                    # One blocking copy off the loop instead of a thread hop per chunk
+                    temp_file = await loop.run_in_executor(
+                        None, self._save_upload, file.file, self._tmpdir, suffix
+                    )
+                    audio = str(temp_file)
                 
                 # Transcribe audio
                 result = await self.transcribe_file(
-                    str(temp_file), 
+                    audio, 
                     language or self.language,
                     task
                 )
                 
-                # Clean up temp file
-                temp_file.unlink(missing_ok=True)
+                # Returned as a response so FastAPI skips its pure-Python
+                # jsonable_encoder pass over the segment list
+                return ORJSONResponse({
+                    "text": result["text"],
+                    "language": result.get("language", "unknown"),
+                    "segments": result.get("segments", []),
+                    "model": self.model_name
+                })
                 
-                return JSONResponse({
+            except Exception as e:
+                logger.error(f"Transcription error: {e}")
+                raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+            finally:
+                # Clean up temp file, including after a failed transcription
+                if temp_file:
+                    temp_file.unlink(missing_ok=True)
+        
+        @self.app.post("/transcribe/pcm")
+        async def transcribe_pcm(
+            request: Request,
+            language: Optional[str] = None,
+            task: str = "transcribe"
+        ):
+            """Transcribe raw 16-bit little-endian PCM sent as the request body"""
+            
+            if not self.model:
+                raise HTTPException(status_code=503, detail="Model not loaded")
+            
+            if request.headers.get("x-format", PCM_FORMAT) != PCM_FORMAT:
+                raise HTTPException(status_code=400, detail=f"X-Format must be {PCM_FORMAT}")
+            try:
+                sample_rate = int(request.headers.get("x-sample-rate", SAMPLE_RATE))
+                channels = int(request.headers.get("x-channels", 1))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="X-Sample-Rate and X-Channels must be integers")
+            if channels < 1 or sample_rate < 1:
+                raise HTTPException(status_code=400, detail="X-Sample-Rate and X-Channels must be positive")
+            if sample_rate != SAMPLE_RATE and not SOUNDFILE_AVAILABLE:
+                raise HTTPException(status_code=400, detail=f"Sample rate must be {SAMPLE_RATE} Hz")
+            
+            body = await request.body()
+            if not body or len(body) % (2 * channels):
+                raise HTTPException(status_code=400, detail="Body is not whole s16le frames")
+            
+            try:
+                # No container to parse: the body already is the sample data
+                audio = self._decode_pcm(body, sample_rate, channels)
+                result = await self.transcribe_file(
+                    audio,
+                    language or self.language,
+                    task
+                )
+                return ORJSONResponse({
                     "text": result["text"],
                     "language": result.get("language", "unknown"),
                     "segments": result.get("segments", []),
@@ -125,6 +343,35 @@ class WhisperServer:
                 logger.error(f"Transcription error: {e}")
                 raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
     
+    def _select_backend(self) -> str:
+        """Pick the inference backend unless WHISPER_BACKEND forces one"""
+        requested = os.getenv("WHISPER_BACKEND")
+        if requested:
+            return requested
+        
+        # CTranslate2 has no ROCm build, so AMD GPUs in WSL use the PyTorch backend
+        if getattr(torch.version, "hip", None) is not None:
+            return "openai"
+        
+        # Without CUDA, an exported model on DirectML beats CPU inference
+        if (self.device == "cpu" and self.use_directml and ONNX_AVAILABLE
+                and "DmlExecutionProvider" in ort.get_available_providers()
+                and Path(self.onnx_dir).is_dir()):
+            return "onnx"
+        
+        # An int8-quantized export is an explicit opt-in for CPU serving
+        if self.device == "cpu" and ONNX_AVAILABLE and self._has_quantized_onnx():
+            return "onnx"
+        
+        return "faster-whisper" if FASTER_WHISPER_AVAILABLE else "openai"
+    
+    def _has_quantized_onnx(self) -> bool:
+        """Whether int8 encoder and decoder exports sit in the ONNX model directory"""
+        return all(
+            (Path(self.onnx_dir) / f"{name}{QUANTIZED_SUFFIX}.onnx").exists()
+            for name in ("encoder_model", "decoder_model")
+        )
+    
     async def load_model(self):
         """Load Whisper model"""
         try:
@@ -132,12 +379,7 @@ class WhisperServer:
             
             # Run model loading in thread pool to avoid blocking
             loop = asyncio.get_event_loop()
-            self.model = await loop.run_in_executor(
-                None, 
-                whisper.load_model, 
-                self.model_name, 
-                self.device
-            )
+            self.model = await loop.run_in_executor(self._gpu_executor, self._load_model_sync)
             
             logger.info("Whisper model loaded successfully")
             
@@ -145,19 +387,271 @@ class WhisperServer:
             logger.error(f"Failed to load Whisper model: {e}")
             raise
     
-    async def transcribe_file(self, audio_path: str, language: str, task: str):
-        """Transcribe audio file"""
+    def _load_model_sync(self):
+        """Load the model for the configured backend (blocking)"""
+        if self.backend == "faster-whisper":
+            if not FASTER_WHISPER_AVAILABLE:
+                raise RuntimeError("faster-whisper backend requested but not installed")
+            logger.info(f"Using faster-whisper with compute type: {self.compute_type}")
+            return WhisperModel(
+                self.model_name,
+                device=self.device,
+                compute_type=self.compute_type,
+                cpu_threads=TORCH_THREADS
+            )
+        
+        if self.backend == "onnx":
+            if not ONNX_AVAILABLE:
+                raise RuntimeError("onnx backend requested but onnxruntime is not installed")
+            providers, sess_options = self._onnx_session_config()
+            # int8 kernels only pay off on the CPU provider
+            quantized = providers == ["CPUExecutionProvider"] and self._has_quantized_onnx()
+            return OnnxWhisper(
+                self.onnx_dir,
+                providers=providers,
+                multilingual=not self.model_name.endswith(".en"),
+                sess_options=sess_options,
+                quantized=quantized
+            )
+        
+        if self.backend != "openai":
+            raise RuntimeError(f"Unknown Whisper backend: {self.backend}")
+        if not OPENAI_WHISPER_AVAILABLE:
+            raise RuntimeError("openai backend requested but openai-whisper is not installed")
+        
+        model = self._load_openai_model()
+        
+        if self.jit_mode == "compile" and not (self.can_compile and self._compile_model(model)):
+            logger.info("Falling back to TorchScript for the encoder")
+            self.jit_mode = "script"
+        if self.jit_mode == "script":
+            model.encoder = self._script_encoder(model)
+        
+        # Cross-attention K/V are already cached per window by DecodingTask's
+        # kv_cache hooks; the encoder pass itself is what fallback retries repeat
+        model.encoder = CachedEncoder(model.encoder)
+        
+        if self.cuda_graphs:
+            try:
+                self._graph_decoder = GraphedGreedyDecoder(model, max(self.max_batch, 1))
+            except Exception as e:
+                logger.warning(f"CUDA graph capture failed, using whisper.decode: {e}")
+        return model
+    
+    def _load_openai_model(self):
+        """whisper.load_model plus FP16 cast, reusing the warm cache when it matches"""
+        warm_path = self.cache_dir / f"whisper_{self.model_name}_{'fp16' if self.fp16 else 'fp32'}.pt"
+        key = f"{self.model_name}:{whisper.__version__}:{torch.__version__}:{self.fp16}"
+        
+        save = True
+        if warm_path.exists():
+            try:
+                model = self._load_warm_model(warm_path, key)
+                if model is not None:
+                    logger.info(f"Whisper model restored from warm cache {warm_path}")
+                    return model
+                logger.info("Warm model cache is stale, rebuilding it")
+            except Exception as e:
+                # e.g. a PyTorch without mmap loading; don't rewrite a cache we can't read
+                logger.warning(f"Warm model cache unusable, loading normally: {e}")
+                save = False
+        
+        model = whisper.load_model(self.model_name, self.device)
+        if self.fp16:
+            model = self._to_half(model)
+            logger.info("Whisper model cast to FP16")
+        
+        # Saved before any JIT/CachedEncoder wrapping so the keys stay Whisper's own
+        if save:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                partial = warm_path.with_suffix(".tmp")
+                torch.save({"key": key, "dims": asdict(model.dims), "sd": model.state_dict()}, partial)
+                os.replace(partial, warm_path)
+            except OSError as e:
+                logger.warning(f"Could not write warm model cache: {e}")
+        return model
+    
+    def _load_warm_model(self, path: Path, key: str):
+        """Rebuild Whisper from a cached state dict without a CPU copy; None if stale"""
+        # mmap maps the file's pages straight into the tensors instead of reading it into RAM
+        checkpoint = torch.load(path, map_location=self.device, mmap=True, weights_only=True)
+        if checkpoint.get("key") != key:
+            return None
+        
+        dims = whisper.model.ModelDimensions(**checkpoint["dims"])
+        # Meta-device skeleton: no allocation or random init before the weights are assigned
+        with torch.device("meta"):
+            model = whisper.model.Whisper(dims)
+        model.load_state_dict(checkpoint["sd"], assign=True)
+        
+        # Non-persistent buffers are not in the state dict, so build them for real
+        model.decoder.register_buffer(
+            "mask",
+            torch.empty(
+                dims.n_text_ctx, dims.n_text_ctx,
+                dtype=torch.float16 if self.fp16 else torch.float32,
+                device=self.device
+            ).fill_(-np.inf).triu_(1),
+            persistent=False
+        )
+        if self.model_name in whisper._ALIGNMENT_HEADS:
+            model.set_alignment_heads(whisper._ALIGNMENT_HEADS[self.model_name])
+        else:
+            all_heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+            all_heads[dims.n_text_layer // 2:] = True
+            model.register_buffer("alignment_heads", all_heads.to_sparse(), persistent=False)
+        return model.to(self.device)
+    
+    def _onnx_session_config(self):
+        """Execution providers and session options for the ONNX backend"""
+        sess_options = ort.SessionOptions()
+        available = ort.get_available_providers()
+        
+        if self.use_directml and "DmlExecutionProvider" in available:
+            # DirectML does not support memory patterns or parallel execution
+            sess_options.enable_mem_pattern = False
+            sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            providers = [
+                ("DmlExecutionProvider", {"device_id": self.directml_device_id}),
+                "CPUExecutionProvider"
+            ]
+        elif self.device == "cuda" and "CUDAExecutionProvider" in available:
+            providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
+        else:
+            # Full graph fusions, and the same thread budget as the torch backends
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            sess_options.intra_op_num_threads = TORCH_THREADS
+            sess_options.inter_op_num_threads = 1
+            providers = ["CPUExecutionProvider"]
+        
+        return providers, sess_options
+    
+    def _dummy_mel(self, model) -> torch.Tensor:
+        """Silent 30-s mel batch matching the model's input shape and dtype"""
+        return torch.zeros(
+            1, model.dims.n_mels, whisper.audio.N_FRAMES,
+            dtype=torch.float16 if self.fp16 else torch.float32,
+            device=self.device
+        )
+    
+    def _script_encoder(self, model) -> torch.nn.Module:
+        """JIT-compile the audio encoder, falling back to eager on failure"""
+        # The decoder stays eager: DecodingTask caches K/V through Python
+        # forward hooks keyed by module objects, which TorchScript drops
+        encoder = model.encoder
+        mel = self._dummy_mel(model)
+        
+        with torch.inference_mode():
+            try:
+                compiled = torch.jit.script(encoder)
+            except Exception as e:
+                # The encoder only ever sees fixed 30-s windows, so a trace is exact
+                logger.info(f"Encoder scripting failed ({e}), tracing instead")
+                try:
+                    compiled = torch.jit.trace(encoder, mel)
+                except Exception as e:
+                    logger.warning(f"Encoder JIT unavailable, using eager mode: {e}")
+                    return encoder
+            
+            # Warm up so profiling-executor fusion happens before the first request
+            for _ in range(2):
+                compiled(mel)
+        
+        logger.info("Whisper encoder JIT-compiled")
+        return compiled
+    
+    def _compile_model(self, model) -> bool:
+        """torch.compile encoder and decoder in place; False if compilation fails"""
+        encoder, decoder = model.encoder, model.decoder
         try:
+            # CUDA graphs suit the encoder's fixed 30-s input
+            model.encoder = torch.compile(encoder, mode="reduce-overhead", fullgraph=False)
+            # The token prefix grows every step and the KV cache outlives each
+            # call, so the decoder uses dynamic shapes without CUDA graphs
+            model.decoder = torch.compile(decoder, dynamic=True, fullgraph=False)
+            
+            # Two warm-up runs: the first compiles, the second records the graphs
+            mel = self._dummy_mel(model)
+            sot = whisper.tokenizer.get_tokenizer(model.is_multilingual).sot
+            tokens = torch.tensor([[sot]], device=self.device)
+            # Warm up under the same grad mode requests run in, so guards match
+            with torch.inference_mode():
+                for _ in range(2):
+                    model.decoder(tokens, model.encoder(mel))
+        except Exception as e:
+            logger.warning(f"torch.compile failed: {e}")
+            model.encoder, model.decoder = encoder, decoder
+            return False
+        
+        logger.info("Whisper encoder and decoder compiled with torch.compile")
+        return True
+    
+    @staticmethod
+    def _to_half(model):
+        """Cast weights to FP16, keeping LayerNorm parameters in FP32"""
+        # Whisper's LayerNorm upcasts activations to FP32 before normalising,
+        # so its affine parameters must stay FP32 as well
+        model = model.half()
+        for module in model.modules():
+            if isinstance(module, torch.nn.LayerNorm):
+                module.float()
+        return model
+    
+    @staticmethod
+    def _save_upload(source, directory: Path, suffix: str) -> Path:
+        """Copy the spooled upload to a fresh temp file in fixed-size chunks (blocking)"""
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=suffix, delete=False) as f:
+            shutil.copyfileobj(source, f, UPLOAD_CHUNK_SIZE)
+        return Path(f.name)
+    
+    @staticmethod
+    def _decode_pcm(body: bytes, sample_rate: int, channels: int) -> np.ndarray:
+        """Convert interleaved s16le PCM to 16 kHz mono float32"""
+        frames = np.frombuffer(body, dtype="<i2").reshape(-1, channels)
+        if channels > 1:
+            audio = frames.mean(axis=1, dtype=np.float32)
+        else:
+            audio = frames[:, 0].astype(np.float32)
+        audio *= np.float32(1 / 32768)
+        if sample_rate != SAMPLE_RATE:
+            audio = torchaudio.functional.resample(
+                torch.from_numpy(audio), sample_rate, SAMPLE_RATE
+            ).numpy()
+        return audio
+    
+    @staticmethod
+    def _decode_audio(source) -> np.ndarray:
+        """Decode a file-like object to 16 kHz mono float32 (blocking)"""
+        # Raises RuntimeError (LibsndfileError) for formats libsndfile can't read
+        audio, sample_rate = sf.read(source, dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+        if sample_rate != SAMPLE_RATE:
+            audio = torchaudio.functional.resample(
+                torch.from_numpy(audio), sample_rate, SAMPLE_RATE
+            ).numpy()
+        return audio
+    
+    async def transcribe_file(self, audio, language: str, task: str):
+        """Transcribe an audio file path or decoded 16 kHz waveform"""
+        try:
+            # Decoded clips that fit one 30-s window can share a batched pass
+            if (self._batch_queue is not None and isinstance(audio, np.ndarray)
+                    and audio.shape[0] <= whisper.audio.N_SAMPLES):
+                future = asyncio.get_event_loop().create_future()
+                await self._batch_queue.put(
+                    (audio, language if language != "auto" else None, task, future)
+                )
+                return await future
+            
             # Run transcription in thread pool
             loop = asyncio.get_event_loop()
             result = await loop.run_in_executor(
-                None,
-                lambda: self.model.transcribe(
-                    audio_path,
-                    language=language if language != "auto" else None,
-                    task=task,
-                    verbose=False
-                )
+                self._gpu_executor,
+                self._transcribe_sync,
+                audio,
+                language if language != "auto" else None,
+                task
             )
             return result
             
@@ -165,12 +659,148 @@ class WhisperServer:
             logger.error(f"Transcription error: {e}")
             raise
     
+    async def _batch_loop(self):
+        """Collect queued clips for a short window and decode them together"""
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self._batch_queue.get()]
+            await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self._batch_queue.empty():
+                batch.append(self._batch_queue.get_nowait())
+            
+            # Only requests with the same decoding options share a forward pass
+            groups = {}
+            for item in batch:
+                groups.setdefault((item[1], item[2]), []).append(item)
+            
+            for (language, task), items in groups.items():
+                try:
+                    if len(items) == 1 and self._graph_decoder is None:
+                        # Nothing to share a pass with: keep transcribe()'s
+                        # temperature fallback and timestamped segments
+                        results = [await loop.run_in_executor(
+                            self._gpu_executor,
+                            self._transcribe_sync,
+                            items[0][0],
+                            language,
+                            task
+                        )]
+                    else:
+                        results = await loop.run_in_executor(
+                            self._gpu_executor,
+                            self._decode_batch_sync,
+                            [item[0] for item in items],
+                            language,
+                            task
+                        )
+                except Exception as e:
+                    logger.error(f"Batched transcription error: {e}")
+                    for item in items:
+                        if not item[3].done():
+                            item[3].set_exception(e)
+                    continue
+                
+                for item, result in zip(items, results):
+                    if not item[3].done():
+                        item[3].set_result(result)
+    
+    @torch.inference_mode()
+    def _decode_batch_sync(self, clips: list, language: Optional[str], task: str) -> list:
+        """Decode a batch of <=30-s clips with one encoder pass (blocking)"""
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(clip),
+                n_mels=self.model.dims.n_mels,
+                device=self.device
+            )
+            for clip in clips
+        ])
+        if self._graph_decoder is not None:
+            audio_features = self.model.encoder(mels.half() if self.fp16 else mels)
+            decoded_list = self._graph_decoder.decode(audio_features, language, task)
+        else:
+            options = whisper.DecodingOptions(
+                language=language,
+                task=task,
+                fp16=self.fp16,
+                without_timestamps=True
+            )
+            decoded_list = whisper.decode(self.model, mels, options)
+        
+        results = []
+        for clip, decoded in zip(clips, decoded_list):
+            # Same silence rule whisper.transcribe applies to each window
+            silent = decoded.no_speech_prob > 0.6 and decoded.avg_logprob < -1.0
+            text = "" if silent else decoded.text
+            results.append({
+                "text": text,
+                "language": decoded.language,
+                "segments": [] if silent else [{
+                    "id": 0,
+                    "seek": 0,
+                    "start": 0.0,
+                    "end": clip.shape[0] / SAMPLE_RATE,
+                    "text": text,
+                    "tokens": decoded.tokens,
+                    "temperature": decoded.temperature,
+                    "avg_logprob": decoded.avg_logprob,
+                    "compression_ratio": decoded.compression_ratio,
+                    "no_speech_prob": decoded.no_speech_prob
+                }]
+            })
+        return results
+    
+    @torch.inference_mode()
+    def _transcribe_sync(self, audio, language: Optional[str], task: str) -> dict:
+        """Run transcription on the loaded model (blocking)"""
+        if self.backend == "faster-whisper":
+            segments, info = self.model.transcribe(
+                audio,
+                language=language,
+                task=task,
+                beam_size=1,
+                vad_filter=True
+            )
+            # Segments are produced lazily; consume them here, off the event loop
+            segment_list = [
+                {
+                    "id": segment.id,
+                    "seek": segment.seek,
+                    "start": segment.start,
+                    "end": segment.end,
+                    "text": segment.text,
+                    "tokens": list(segment.tokens),
+                    "temperature": segment.temperature,
+                    "avg_logprob": segment.avg_logprob,
+                    "compression_ratio": segment.compression_ratio,
+                    "no_speech_prob": segment.no_speech_prob
+                }
+                for segment in segments
+            ]
+            return {
+                "text": "".join(segment["text"] for segment in segment_list),
+                "language": info.language,
+                "segments": segment_list
+            }
+        
+        if self.backend == "onnx":
+            return self.model.transcribe(audio, language=language, task=task)
+        
+        return self.model.transcribe(
+            audio,
+            language=language,
+            task=task,
+            fp16=self.fp16,
+            verbose=False
+        )
+    
     def run(self, host: str = "100.110.82.181", port: int = 8001):
         """Run the Whisper server"""
         uvicorn.run(
             self.app,
             host=host,
             port=port,
+            loop="uvloop" if UVLOOP_AVAILABLE else "asyncio",
             log_level="info",
             access_log=True
         )
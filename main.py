@@ -4,6 +4,7 @@
 
 import asyncio
 import logging
+import sys
 from pathlib import Path
 
 from src.core.assistant import WindowsAIAssistant
@@ -44,4 +45,11 @@ async def main():
         await assistant.stop()
 
 if __name__ == "__main__":
+    # uvloop has no Windows build; elsewhere it speeds up the aiohttp traffic
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
     asyncio.run(main())
\ No newline at end of file
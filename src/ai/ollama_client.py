@@ -1,10 +1,16 @@
 import aiohttp
 import asyncio
-import json
 import logging
+import orjson
+import os
+import re
 from typing import Dict, Any, Optional, AsyncGenerator
 from dataclasses import dataclass
 
+# Sentence boundary: terminal punctuation followed by whitespace (so "3.5" stays whole)
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
 @dataclass
 class OllamaResponse:
     """Response from Ollama API"""
@@ -19,16 +25,19 @@ class OllamaResponse:
 class OllamaClient:
     """Client for communicating with local Ollama server"""
     
-    def __init__(self, host: str = "localhost", port: int = 11434):
+    def __init__(self, host: str = "localhost", port: int = 11434, socket_path: Optional[str] = None):
         self.host = host
         self.port = port
+        # URLs keep host:port for the Host header even when a socket carries the bytes
         self.base_url = f"http://{host}:{port}"
+        self.socket_path = socket_path
         self.session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
         self.logger = logging.getLogger(__name__)
     
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession()
+        await self.ensure_session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -36,11 +45,40 @@ class OllamaClient:
         if self.session:
             await self.session.close()
     
+    async def ensure_session(self) -> aiohttp.ClientSession:
+        """Create the shared HTTP session once, with keep-alive pooling"""
+        if self.session and not self.session.closed:
+            return self.session
+        
+        async with self._session_lock:
+            if not self.session or self.session.closed:
+                if self.socket_path and os.name != "nt" and os.path.exists(self.socket_path):
+                    # Same-host Ollama: skip the loopback TCP stack for every streamed chunk
+                    connector = aiohttp.UnixConnector(
+                        path=self.socket_path,
+                        limit=32,
+                        keepalive_timeout=300
+                    )
+                    self.logger.info(f"Connecting to Ollama over Unix socket {self.socket_path}")
+                else:
+                    # Keep connections (and resolved Tailscale hosts) alive between
+                    # requests so short chats don't pay TCP setup each time
+                    connector = aiohttp.TCPConnector(
+                        limit=32,
+                        ttl_dns_cache=600,
+                        keepalive_timeout=300
+                    )
+                # Bound stalls rather than total time: long generations stream for minutes
+                self.session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=120)
+                )
+        return self.session
+    
     async def check_connection(self) -> bool:
         """Check if Ollama server is running and accessible"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
+            await self.ensure_session()
             
             async with self.session.get(f"{self.base_url}/api/tags") as response:
                 if response.status == 200:
@@ -59,12 +97,11 @@ class OllamaClient:
     async def list_models(self) -> Dict[str, Any]:
         """List available models on the Ollama server"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
+            await self.ensure_session()
             
             async with self.session.get(f"{self.base_url}/api/tags") as response:
                 if response.status == 200:
-                    return await response.json()
+                    return orjson.loads(await response.read())
                 else:
                     self.logger.error(f"Failed to list models: HTTP {response.status}")
                     return {"models": []}
@@ -80,8 +117,7 @@ class OllamaClient:
                               stream: bool = False) -> OllamaResponse:
         """Generate a response from the AI model"""
         
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        await self.ensure_session()
         
         payload = {
             "model": model,
@@ -112,29 +148,26 @@ class OllamaClient:
                     )
                 
                 if stream:
-                    # Handle streaming response
-                    full_content = ""
-                    async for line in response.content:
-                        if line:
-                            try:
-                                chunk = json.loads(line.decode('utf-8'))
-                                if 'response' in chunk:
-                                    full_content += chunk['response']
-                                if chunk.get('done', False):
-                                    return OllamaResponse(
-                                        content=full_content,
-                                        model=chunk.get('model', model),
-                                        done=True,
-                                        total_duration=chunk.get('total_duration'),
-                                        load_duration=chunk.get('load_duration'),
-                                        prompt_eval_count=chunk.get('prompt_eval_count'),
-                                        eval_count=chunk.get('eval_count')
-                                    )
-                            except json.JSONDecodeError:
-                                continue
+                    # Aggregate only because the caller asked for a full response;
+                    # use stream_response() to consume tokens as they arrive
+                    parts = []
+                    async for chunk in self._iter_chunks(response):
+                        if 'response' in chunk:
+                            parts.append(chunk['response'])
+                        if chunk.get('done', False):
+                            return OllamaResponse(
+                                content="".join(parts),
+                                model=chunk.get('model', model),
+                                done=True,
+                                total_duration=chunk.get('total_duration'),
+                                load_duration=chunk.get('load_duration'),
+                                prompt_eval_count=chunk.get('prompt_eval_count'),
+                                eval_count=chunk.get('eval_count')
+                            )
+                    return OllamaResponse(content="".join(parts), model=model, done=False)
                 else:
                     # Handle non-streaming response
-                    result = await response.json()
+                    result = orjson.loads(await response.read())
                     return OllamaResponse(
                         content=result.get('response', ''),
                         model=result.get('model', model),
@@ -160,11 +193,106 @@ class OllamaClient:
                 done=True
             )
     
+    async def stream_response(self,
+                              prompt: str,
+                              model: str = "llama3.2:3b",
+                              system_prompt: Optional[str] = None,
+                              temperature: float = 0.7) -> AsyncGenerator[str, None]:
+        """Yield response tokens as Ollama produces them"""
+        
+        await self.ensure_session()
+        
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": {
+                "temperature": temperature,
+                "num_predict": 1000,  # Max tokens to generate
+            }
+        }
+        
+        if system_prompt:
+            payload["system"] = system_prompt
+        
+        try:
+            async with self.session.post(
+                f"{self.base_url}/api/generate",
+                json=payload,
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                
+                if response.status != 200:
+                    self.logger.error(f"Ollama API error: HTTP {response.status}")
+                    return
+                
+                async for chunk in self._iter_chunks(response):
+                    if chunk.get('response'):
+                        yield chunk['response']
+                    if chunk.get('done', False):
+                        return
+                        
+        except aiohttp.ClientError as e:
+            self.logger.error(f"Network error communicating with Ollama: {e}")
+    
+    async def stream_chat(self, messages: list, model: str = "llama3.2:3b") -> AsyncGenerator[str, None]:
+        """Yield chat reply tokens as Ollama produces them, using conversation history"""
+        
+        await self.ensure_session()
+        
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True
+        }
+        
+        try:
+            async with self.session.post(
+                f"{self.base_url}/api/chat",
+                json=payload,
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                
+                if response.status != 200:
+                    self.logger.error(f"Ollama chat API error: HTTP {response.status}")
+                    return
+                
+                async for chunk in self._iter_chunks(response):
+                    content = chunk.get('message', {}).get('content')
+                    if content:
+                        yield content
+                    if chunk.get('done', False):
+                        return
+                        
+        except aiohttp.ClientError as e:
+            self.logger.error(f"Network error communicating with Ollama: {e}")
+    
+    async def stream_sentences(self, messages: list, model: str = "llama3.2:3b") -> AsyncGenerator[str, None]:
+        """Yield whole sentences from stream_chat, so TTS can start on the first one"""
+        buffer = ""
+        async for token in self.stream_chat(messages, model):
+            buffer += token
+            *sentences, buffer = SENTENCE_BOUNDARY.split(buffer)
+            for sentence in sentences:
+                if sentence.strip():
+                    yield sentence.strip()
+        if buffer.strip():
+            yield buffer.strip()
+    
+    async def _iter_chunks(self, response: aiohttp.ClientResponse) -> AsyncGenerator[Dict[str, Any], None]:
+        """Parse Ollama's newline-delimited JSON stream"""
+        async for line in response.content:
+            if line:
+                try:
+                    # orjson parses the raw bytes; no per-token decode to str
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+    
     async def chat(self, messages: list, model: str = "llama3.2:3b") -> OllamaResponse:
         """Chat with the model using conversation history"""
         
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        await self.ensure_session()
         
         payload = {
             "model": model,
@@ -187,7 +315,7 @@ class OllamaClient:
                         done=True
                     )
                 
-                result = await response.json()
+                result = orjson.loads(await response.read())
                 message_content = result.get('message', {}).get('content', '')
                 
                 return OllamaResponse(
@@ -1,5 +1,6 @@
 # Configuration settings for Windows AI Assistant
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 from pydantic_settings import BaseSettings
@@ -13,11 +14,13 @@ class AssistantSettings(BaseSettings):
     ollama_port: int = Field(default=11434, description="Ollama server port")
     ollama_model: str = Field(default="llama3.2:3b", description="Default Ollama model to use")
     use_tailscale: bool = Field(default=True, description="Use Tailscale networking for distributed setup")
+    ollama_socket_path: Optional[str] = Field(default=None, description="Unix socket for a same-host Ollama (proxied or OLLAMA_HOST=unix:...), non-Windows only")
     
     # Speech Recognition Settings
     wake_word: str = Field(default="wolf-logic", description="Wake word to activate the assistant")
     use_whisper: bool = Field(default=False, description="Use local Whisper instead of Windows Speech Recognition")
     whisper_model: str = Field(default="base", description="Whisper model size (tiny, base, small, medium, large)")
+    whisper_compute_type: str = Field(default="auto", description="Local Whisper precision: auto (float16 on GPU, float32 on CPU), float16, float32")
     
     # Text-to-Speech Settings
     tts_rate: int = Field(default=200, description="Speech rate for TTS")
@@ -51,6 +54,11 @@ class AssistantSettings(BaseSettings):
         env_file = ".env"
         env_file_encoding = "utf-8"
 
+@lru_cache(maxsize=1)
 def load_config() -> AssistantSettings:
-    """Load configuration from environment variables and .env file"""
-    return AssistantSettings()
\ No newline at end of file
+    """Load configuration from environment variables and .env file (parsed once)"""
+    return AssistantSettings()
+
+def invalidate_config():
+    """Drop the cached settings so the next load_config() re-reads .env"""
+    load_config.cache_clear()
@@ -1,35 +1,244 @@
 import asyncio
+import ctypes
+import functools
+import itertools
 import subprocess
-import os
 import logging
 import json
+import os
+import re
+import shlex
+import shutil
 import time
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from ctypes import wintypes
 from enum import Enum
 from dataclasses import dataclass
 import win32api
 import win32con
 import win32gui
 import win32process
+from win32com.shell import shell, shellcon
 import psutil
 import keyboard
 import mouse
+from cachetools import TTLCache
 from pathlib import Path
 
+# SendInput structures (winuser.h). MOUSEINPUT is the largest union member,
+# so it must be declared for sizeof(_INPUT) to match what user32 expects
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+
+class _KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", wintypes.WORD),
+        ("wScan", wintypes.WORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+class _MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ("dx", wintypes.LONG),
+        ("dy", wintypes.LONG),
+        ("mouseData", wintypes.DWORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+class _INPUTUNION(ctypes.Union):
+    _fields_ = [("ki", _KEYBDINPUT), ("mi", _MOUSEINPUT)]
+
+class _INPUT(ctypes.Structure):
+    _fields_ = [("type", wintypes.DWORD), ("union", _INPUTUNION)]
+
+_user32 = ctypes.WinDLL("user32", use_last_error=True)
+_user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(_INPUT), ctypes.c_int)
+_user32.SendInput.restype = wintypes.UINT
+
+def _send_unicode_text(text: str) -> bool:
+    """Type text with a single SendInput call; False if injection was blocked outright"""
+    # KEYEVENTF_UNICODE takes UTF-16 code units, so astral characters become
+    # surrogate pairs. Newlines go out as Enter, which editors expect
+    units = []
+    for char in text.replace("\r\n", "\n"):
+        if char == "\n":
+            units.append((win32con.VK_RETURN, 0, 0))
+        else:
+            encoded = char.encode("utf-16-le")
+            for i in range(0, len(encoded), 2):
+                units.append((0, int.from_bytes(encoded[i:i + 2], "little"), KEYEVENTF_UNICODE))
+    
+    inputs = (_INPUT * (2 * len(units)))()
+    for i, (vk, scan, flags) in enumerate(units):
+        for event, extra in ((inputs[2 * i], 0), (inputs[2 * i + 1], KEYEVENTF_KEYUP)):
+            event.type = INPUT_KEYBOARD
+            event.union.ki.wVk = vk
+            event.union.ki.wScan = scan
+            event.union.ki.dwFlags = flags | extra
+    
+    if not inputs:
+        return True
+    sent = _user32.SendInput(len(inputs), inputs, ctypes.sizeof(_INPUT))
+    if sent == 0:
+        return False
+    if sent != len(inputs):
+        raise ctypes.WinError(ctypes.get_last_error())
+    return True
+
 class CommandRiskLevel(Enum):
     SAFE = "safe"           # No confirmation needed
     MODERATE = "moderate"   # Requires confirmation
     HIGH = "high"          # Requires confirmation + extra warning
     CRITICAL = "critical"   # Requires confirmation + detailed explanation
 
-@dataclass
+# Slots drop the per-instance __dict__; entries are never mutated once queued
+@dataclass(slots=True, frozen=True)
 class PendingCommand:
     command: str
     action: str
     risk_level: CommandRiskLevel
     description: str
-    timestamp: float
+    timestamp: float  # time.monotonic() at creation
     parameters: Dict[str, Any]
+    expires_at: float  # timestamp + command_timeout, fixed at creation
+
+# Command categories and their risk levels
+_COMMAND_RISKS: Dict[str, CommandRiskLevel] = {
+    # File Operations
+    "open_file": CommandRiskLevel.SAFE,
+    "create_file": CommandRiskLevel.MODERATE,
+    "delete_file": CommandRiskLevel.HIGH,
+    "move_file": CommandRiskLevel.MODERATE,
+    "copy_file": CommandRiskLevel.SAFE,
+    
+    # Application Control
+    "launch_app": CommandRiskLevel.SAFE,
+    "close_app": CommandRiskLevel.SAFE,
+    "kill_process": CommandRiskLevel.HIGH,
+    
+    # System Control
+    "shutdown": CommandRiskLevel.CRITICAL,
+    "restart": CommandRiskLevel.CRITICAL,
+    "sleep": CommandRiskLevel.MODERATE,
+    "lock_workstation": CommandRiskLevel.SAFE,
+    
+    # Window Management
+    "minimize_window": CommandRiskLevel.SAFE,
+    "maximize_window": CommandRiskLevel.SAFE,
+    "close_window": CommandRiskLevel.SAFE,
+    "switch_window": CommandRiskLevel.SAFE,
+    
+    # Input Control
+    "type_text": CommandRiskLevel.MODERATE,
+    "press_key": CommandRiskLevel.MODERATE,
+    "click_mouse": CommandRiskLevel.MODERATE,
+    
+    # System Settings
+    "change_volume": CommandRiskLevel.SAFE,
+    "change_brightness": CommandRiskLevel.SAFE,
+    "change_wallpaper": CommandRiskLevel.MODERATE,
+    
+    # Network
+    "network_disconnect": CommandRiskLevel.HIGH,
+    "network_connect": CommandRiskLevel.MODERATE,
+    
+    # Registry/System Files
+    "registry_edit": CommandRiskLevel.CRITICAL,
+    "system_file_edit": CommandRiskLevel.CRITICAL,
+    
+    # PowerShell/Terminal
+    "run_powershell": CommandRiskLevel.HIGH,
+    "run_cmd": CommandRiskLevel.HIGH,
+    "run_terminal": CommandRiskLevel.HIGH,
+}
+
+# Small-int command ids in _COMMAND_RISKS order: one hash lookup per command,
+# then risk level, handler and argument spec are plain list indexing
+_COMMAND_ID: Dict[str, int] = {name: i for i, name in enumerate(_COMMAND_RISKS)}
+_COMMAND_RISK_BY_ID: List[CommandRiskLevel] = list(_COMMAND_RISKS.values())
+
+# Spoken ahead of the action in confirmation prompts
+_RISK_WARNINGS: Dict[CommandRiskLevel, str] = {
+    CommandRiskLevel.MODERATE: "This action requires confirmation.",
+    CommandRiskLevel.HIGH: "⚠️ WARNING: This is a potentially risky operation!",
+    CommandRiskLevel.CRITICAL: "🚨 CRITICAL: This operation could significantly impact your system!"
+}
+
+# Human-readable descriptions for confirmation prompts
+_DESCRIPTIONS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "open_file": lambda k: f"Open file: {k.get('path', 'unknown')}",
+    "delete_file": lambda k: f"DELETE file: {k.get('path', 'unknown')}",
+    "launch_app": lambda k: f"Launch application: {k.get('app_name', 'unknown')}",
+    "kill_process": lambda k: f"Force close process: {k.get('process_name', 'unknown')}",
+    "shutdown": lambda k: "Shutdown the computer",
+    "restart": lambda k: "Restart the computer", 
+    "run_powershell": lambda k: f"Run PowerShell command: {k.get('script', 'unknown')}",
+    "type_text": lambda k: f"Type text: '{k.get('text', '')}'",
+    "registry_edit": lambda k: f"Edit registry: {k.get('key', 'unknown')}",
+}
+
+def _format_description(command: str, kwargs: Dict[str, Any]) -> str:
+    generator = _DESCRIPTIONS.get(command)
+    return generator(kwargs) if generator else f"Execute {command} with parameters: {kwargs}"
+
+@functools.lru_cache(maxsize=256)
+def _describe(command: str, items: Tuple[Tuple[str, Any], ...]) -> str:
+    """Cached description for hashable parameters; bounded so odd inputs can't grow it"""
+    # A tuple rather than a frozenset keeps the parameters in the order they were given
+    return _format_description(command, dict(items))
+
+# Result message prefixes when a handler raises; {fields} are filled from
+# the command's parameters
+_FAILURE_MESSAGES: Dict[str, str] = {
+    "launch_app": "Failed to launch {app_name}",
+    "open_file": "Failed to open file",
+    "run_powershell": "PowerShell execution failed",
+    "type_text": "Failed to type text",
+    "press_key": "Failed to press key",
+    "shutdown": "Failed to shutdown",
+    "lock_workstation": "Failed to lock workstation",
+}
+
+def _split_command_line(command: str) -> Tuple[str, Optional[str]]:
+    """Split "program args..." into the program and its argument string for ShellExecuteEx"""
+    # An existing path is a program on its own, even with unquoted spaces
+    if os.path.exists(command):
+        return command, None
+    # posix=False leaves quotes and backslashes in the arguments as typed
+    program, *args = shlex.split(command, posix=False)
+    return program.strip('"'), " ".join(args) or None
+
+class _MissingAsNone(dict):
+    """format_map mapping that renders absent parameters as None, like kwargs.get"""
+    def __missing__(self, key: str) -> None:
+        return None
+
+# Seconds a PowerShell command may run before it is killed
+POWERSHELL_TIMEOUT = 30
+
+# Executables for applications commonly launched by name
+_COMMON_APPS: Dict[str, str] = {
+    "notepad": "notepad.exe",
+    "calculator": "calc.exe",
+    "chrome": "chrome.exe",
+    "edge": "msedge.exe",
+    "firefox": "firefox.exe",
+    "explorer": "explorer.exe",
+    "cmd": "cmd.exe",
+    "powershell": "powershell.exe",
+    "terminal": "wt.exe"
+}
+
+# Absolute paths found once at import, so launches skip the PATH search.
+# Anything not found stays a bare name for the shell to resolve at launch time
+_COMMON_APPS_RESOLVED: Dict[str, str] = {
+    name: shutil.which(exe) or exe for name, exe in _COMMON_APPS.items()
+}
 
 class WindowsDeviceController:
     """
@@ -40,65 +249,58 @@ class WindowsDeviceController:
     def __init__(self, confirmation_keyword: str = "wolf-logic"):
         self.logger = logging.getLogger(__name__)
         self.confirmation_keyword = confirmation_keyword
-        self.pending_commands: Dict[str, PendingCommand] = {}
+        # Case-insensitive search scans the transcript without lowercasing a copy of it
+        self._confirm_re = re.compile(re.escape(confirmation_keyword), re.IGNORECASE)
         self.command_timeout = 30.0  # 30 seconds to confirm
+        # Entries expire on their own and the size is capped, so commands that
+        # are never confirmed can't accumulate
+        self.pending_commands: TTLCache = TTLCache(maxsize=1024, ttl=self.command_timeout)
+        # Confirmed commands run concurrently, but not as an unbounded burst of subprocesses
+        self.max_concurrent_confirms = 4
+        self._confirm_semaphore = asyncio.Semaphore(self.max_concurrent_confirms)
+        # Unique per process, unlike the old per-second timestamp suffix
+        self._cmd_counter = itertools.count()
         
         # Callback for requesting confirmation from user
         self.confirmation_callback: Optional[callable] = None
+        self._confirmation_callback_is_async = False
         
-        # Command categories and their risk levels
-        self.command_risks = {
-            # File Operations
-            "open_file": CommandRiskLevel.SAFE,
-            "create_file": CommandRiskLevel.MODERATE,
-            "delete_file": CommandRiskLevel.HIGH,
-            "move_file": CommandRiskLevel.MODERATE,
-            "copy_file": CommandRiskLevel.SAFE,
-            
-            # Application Control
-            "launch_app": CommandRiskLevel.SAFE,
-            "close_app": CommandRiskLevel.SAFE,
-            "kill_process": CommandRiskLevel.HIGH,
-            
-            # System Control
-            "shutdown": CommandRiskLevel.CRITICAL,
-            "restart": CommandRiskLevel.CRITICAL,
-            "sleep": CommandRiskLevel.MODERATE,
-            "lock_workstation": CommandRiskLevel.SAFE,
-            
-            # Window Management
-            "minimize_window": CommandRiskLevel.SAFE,
-            "maximize_window": CommandRiskLevel.SAFE,
-            "close_window": CommandRiskLevel.SAFE,
-            "switch_window": CommandRiskLevel.SAFE,
-            
-            # Input Control
-            "type_text": CommandRiskLevel.MODERATE,
-            "press_key": CommandRiskLevel.MODERATE,
-            "click_mouse": CommandRiskLevel.MODERATE,
-            
-            # System Settings
-            "change_volume": CommandRiskLevel.SAFE,
-            "change_brightness": CommandRiskLevel.SAFE,
-            "change_wallpaper": CommandRiskLevel.MODERATE,
-            
-            # Network
-            "network_disconnect": CommandRiskLevel.HIGH,
-            "network_connect": CommandRiskLevel.MODERATE,
-            
-            # Registry/System Files
-            "registry_edit": CommandRiskLevel.CRITICAL,
-            "system_file_edit": CommandRiskLevel.CRITICAL,
-            
-            # PowerShell/Terminal
-            "run_powershell": CommandRiskLevel.HIGH,
-            "run_cmd": CommandRiskLevel.HIGH,
-            "run_terminal": CommandRiskLevel.HIGH,
+        # Command categories and their risk levels (shared, read-only)
+        self.command_risks = _COMMAND_RISKS
+        
+        # Dispatch table for implemented commands, and the keyword arguments
+        # each handler takes positionally
+        self._handlers: Dict[str, Callable[..., Any]] = {
+            "launch_app": self._launch_app,
+            "open_file": self._open_file,
+            "run_powershell": self._run_powershell,
+            "type_text": self._type_text,
+            "press_key": self._press_key,
+            "shutdown": self._shutdown,
+            "lock_workstation": self._lock_workstation,
+        }
+        self._arg_specs: Dict[str, Tuple[str, ...]] = {
+            "launch_app": ("app_name", "path"),
+            "open_file": ("path",),
+            "run_powershell": ("script",),
+            "type_text": ("text",),
+            "press_key": ("key",),
+            "shutdown": (),
+            "lock_workstation": (),
         }
+        # Indexed by _COMMAND_ID; None where a command has no implementation yet
+        self._handlers_by_id: List[Optional[Callable[..., Any]]] = [
+            self._handlers.get(name) for name in _COMMAND_ID
+        ]
+        self._arg_specs_by_id: List[Tuple[str, ...]] = [
+            self._arg_specs.get(name, ()) for name in _COMMAND_ID
+        ]
     
     def set_confirmation_callback(self, callback: callable):
         """Set callback function to request confirmation from user"""
         self.confirmation_callback = callback
+        # Fixed for a given callback, so checked once here rather than per prompt
+        self._confirmation_callback_is_async = asyncio.iscoroutinefunction(callback)
     
     async def execute_command(self, command: str, **kwargs) -> Dict[str, Any]:
         """
@@ -107,7 +309,8 @@ class WindowsDeviceController:
         """
         try:
             # Parse and validate command
-            risk_level = self.command_risks.get(command, CommandRiskLevel.HIGH)
+            cmd_id = _COMMAND_ID.get(command, -1)
+            risk_level = _COMMAND_RISK_BY_ID[cmd_id] if cmd_id >= 0 else CommandRiskLevel.HIGH
             
             # Generate command description
             description = self._generate_command_description(command, kwargs)
@@ -115,14 +318,16 @@ class WindowsDeviceController:
             # Check if confirmation is needed
             if risk_level != CommandRiskLevel.SAFE:
                 # Create pending command
-                command_id = f"{command}_{int(time.time())}"
+                command_id = f"{command}-{next(self._cmd_counter)}"
+                now = time.monotonic()
                 pending_cmd = PendingCommand(
                     command=command,
                     action=description,
                     risk_level=risk_level,
                     description=description,
-                    timestamp=time.time(),
-                    parameters=kwargs
+                    timestamp=now,
+                    parameters=kwargs,
+                    expires_at=now + self.command_timeout
                 )
                 
                 self.pending_commands[command_id] = pending_cmd
@@ -139,7 +344,7 @@ class WindowsDeviceController:
                 }
             else:
                 # Execute safe command immediately
-                return await self._execute_internal(command, **kwargs)
+                return await self._dispatch(cmd_id, command, kwargs)
                 
         except Exception as e:
             self.logger.error(f"Error executing command {command}: {e}")
@@ -153,35 +358,36 @@ class WindowsDeviceController:
         """
         Process confirmation input from user
         """
-        if self.confirmation_keyword.lower() not in confirmation_text.lower():
+        if not self._confirm_re.search(confirmation_text):
             return {
                 "success": False,
                 "message": f"Invalid confirmation. Please say '{self.confirmation_keyword}' to confirm pending commands."
             }
         
-        # Find and execute pending commands that haven't timed out
-        current_time = time.time()
-        executed_commands = []
-        
-        for command_id, pending_cmd in list(self.pending_commands.items()):
-            if current_time - pending_cmd.timestamp <= self.command_timeout:
-                # Execute the pending command
-                result = await self._execute_internal(
-                    pending_cmd.command, 
-                    **pending_cmd.parameters
-                )
-                executed_commands.append({
-                    "command": pending_cmd.command,
-                    "result": result
-                })
-                # Remove from pending
-                del self.pending_commands[command_id]
+        # Iterating a TTLCache only yields commands still inside their window.
+        # Claim them all before awaiting so a re-entrant confirmation can't run them twice
+        confirmed = [
+            pending_cmd for pending_cmd in (
+                self.pending_commands.pop(command_id, None)
+                for command_id in list(self.pending_commands)
+            )
+            if pending_cmd is not None
+        ]
         
-        # Clean up timed out commands
-        self.pending_commands = {
-            cmd_id: cmd for cmd_id, cmd in self.pending_commands.items()
-            if current_time - cmd.timestamp <= self.command_timeout
-        }
+        results = await asyncio.gather(
+            *(self._execute_limited(pending_cmd) for pending_cmd in confirmed),
+            return_exceptions=True
+        )
+        executed_commands = [
+            {
+                "command": pending_cmd.command,
+                "result": result if not isinstance(result, BaseException) else {
+                    "success": False,
+                    "message": f"Execution error: {str(result)}"
+                }
+            }
+            for pending_cmd, result in zip(confirmed, results)
+        ]
         
         if executed_commands:
             return {
@@ -195,241 +401,185 @@ class WindowsDeviceController:
                 "message": "No pending commands to execute or all commands have timed out"
             }
     
+    async def _execute_limited(self, pending_cmd: PendingCommand) -> Dict[str, Any]:
+        """Run one confirmed command, capped at max_concurrent_confirms at a time"""
+        async with self._confirm_semaphore:
+            return await self._execute_internal(pending_cmd.command, **pending_cmd.parameters)
+    
     async def _request_confirmation(self, command_id: str, pending_cmd: PendingCommand):
         """Request confirmation from user via callback"""
-        if self.confirmation_callback:
-            risk_warnings = {
-                CommandRiskLevel.MODERATE: "This action requires confirmation.",
-                CommandRiskLevel.HIGH: "⚠️ WARNING: This is a potentially risky operation!",
-                CommandRiskLevel.CRITICAL: "🚨 CRITICAL: This operation could significantly impact your system!"
-            }
-            
-            warning = risk_warnings.get(pending_cmd.risk_level, "")
+        callback = self.confirmation_callback
+        if callback:
+            warning = _RISK_WARNINGS.get(pending_cmd.risk_level, "")
             message = f"{warning}\nAction: {pending_cmd.description}\nSay '{self.confirmation_keyword}' to confirm."
             
             try:
-                if asyncio.iscoroutinefunction(self.confirmation_callback):
-                    await self.confirmation_callback(message)
+                if self._confirmation_callback_is_async:
+                    await callback(message)
                 else:
-                    self.confirmation_callback(message)
+                    callback(message)
             except Exception as e:
                 self.logger.error(f"Error in confirmation callback: {e}")
     
     def _generate_command_description(self, command: str, kwargs: Dict[str, Any]) -> str:
         """Generate human-readable description of command"""
-        descriptions = {
-            "open_file": lambda k: f"Open file: {k.get('path', 'unknown')}",
-            "delete_file": lambda k: f"DELETE file: {k.get('path', 'unknown')}",
-            "launch_app": lambda k: f"Launch application: {k.get('app_name', 'unknown')}",
-            "kill_process": lambda k: f"Force close process: {k.get('process_name', 'unknown')}",
-            "shutdown": lambda k: "Shutdown the computer",
-            "restart": lambda k: "Restart the computer", 
-            "run_powershell": lambda k: f"Run PowerShell command: {k.get('script', 'unknown')}",
-            "type_text": lambda k: f"Type text: '{k.get('text', '')}'",
-            "registry_edit": lambda k: f"Edit registry: {k.get('key', 'unknown')}",
-        }
-        
-        generator = descriptions.get(command, lambda k: f"Execute {command} with parameters: {k}")
-        return generator(kwargs)
+        try:
+            # Repeated commands (key macros, typed phrases) reuse the formatted string
+            return _describe(command, tuple(kwargs.items()))
+        except TypeError:
+            # Unhashable parameter values skip the cache
+            return _format_description(command, kwargs)
     
     async def _execute_internal(self, command: str, **kwargs) -> Dict[str, Any]:
         """Internal command execution - bypasses confirmation"""
-        
-        try:
-            if command == "launch_app":
-                return await self._launch_app(kwargs.get('app_name'), kwargs.get('path'))
-            
-            elif command == "open_file":
-                return await self._open_file(kwargs.get('path'))
-            
-            elif command == "kill_process":
-                return await self._kill_process(kwargs.get('process_name'))
-            
-            elif command == "run_powershell":
-                return await self._run_powershell(kwargs.get('script'))
-            
-            elif command == "type_text":
-                return await self._type_text(kwargs.get('text'))
-            
-            elif command == "press_key":
-                return await self._press_key(kwargs.get('key'))
-            
-            elif command == "click_mouse":
-                return await self._click_mouse(kwargs.get('x'), kwargs.get('y'), kwargs.get('button', 'left'))
-            
-            elif command == "shutdown":
-                return await self._shutdown()
-            
-            elif command == "restart":
-                return await self._restart()
-            
-            elif command == "lock_workstation":
-                return await self._lock_workstation()
-            
-            elif command == "change_volume":
-                return await self._change_volume(kwargs.get('level'))
-            
-            # Add more command implementations as needed
-            else:
-                return {
-                    "success": False,
-                    "message": f"Command '{command}' not implemented yet"
-                }
-                
-        except Exception as e:
-            self.logger.error(f"Error in _execute_internal for {command}: {e}")
+        return await self._dispatch(_COMMAND_ID.get(command, -1), command, kwargs)
+    
+    async def _dispatch(self, cmd_id: int, command: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the handler for an already-resolved command id"""
+        handler = self._handlers_by_id[cmd_id] if cmd_id >= 0 else None
+        if handler is None:
+            # Add more command implementations to _handlers as needed
             return {
                 "success": False,
-                "message": f"Execution error: {str(e)}"
+                "message": f"Command '{command}' not implemented yet"
             }
-    
-    # Individual command implementations
-    async def _launch_app(self, app_name: str, path: str = None) -> Dict[str, Any]:
-        """Launch an application"""
+        
         try:
-            if path:
-                subprocess.Popen(path)
-            else:
-                # Try to find common applications
-                common_apps = {
-                    "notepad": "notepad.exe",
-                    "calculator": "calc.exe",
-                    "chrome": "chrome.exe",
-                    "edge": "msedge.exe",
-                    "firefox": "firefox.exe",
-                    "explorer": "explorer.exe",
-                    "cmd": "cmd.exe",
-                    "powershell": "powershell.exe",
-                    "terminal": "wt.exe"
-                }
+            result = handler(*[kwargs.get(name) for name in self._arg_specs_by_id[cmd_id]])
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
                 
-                app_exe = common_apps.get(app_name.lower(), f"{app_name}.exe")
-                subprocess.Popen(app_exe)
-            
-            return {
-                "success": True,
-                "message": f"Launched {app_name}",
-                "data": {"app": app_name, "path": path}
-            }
         except Exception as e:
+            # Handlers raise freely; this is the one place failures become results
+            self.logger.error(f"Error in _dispatch for {command}: {e}")
+            prefix = _FAILURE_MESSAGES.get(command, "Execution error")
             return {
                 "success": False,
-                "message": f"Failed to launch {app_name}: {str(e)}"
+                "message": f"{prefix.format_map(_MissingAsNone(kwargs))}: {str(e)}"
             }
     
-    async def _open_file(self, file_path: str) -> Dict[str, Any]:
+    # Individual command implementations. Only PowerShell does real I/O worth
+    # awaiting; the rest are quick blocking Win32 calls and stay synchronous
+    def _launch_app(self, app_name: str, path: str = None) -> Dict[str, Any]:
+        """Launch an application"""
+        if path:
+            # path may carry arguments, as a Popen command line could
+            program, parameters = _split_command_line(path)
+            self._shell_open(program, parameters)
+        else:
+            # Try to find common applications; the shell also resolves
+            # App Paths entries (chrome.exe, msedge.exe) that aren't on PATH
+            app_exe = _COMMON_APPS_RESOLVED.get(app_name.lower(), f"{app_name}.exe")
+            self._shell_open(app_exe)
+        
+        return {
+            "success": True,
+            "message": f"Launched {app_name}",
+            "data": {"app": app_name, "path": path}
+        }
+    
+    @staticmethod
+    def _shell_open(target: str, parameters: Optional[str] = None):
+        """Open a program or document through one ShellExecuteEx call"""
+        # No stdio pipes or handle inheritance to set up, unlike subprocess.Popen;
+        # NO_UI turns failures into exceptions instead of a modal error dialog
+        shell.ShellExecuteEx(
+            fMask=shellcon.SEE_MASK_NOASYNC | shellcon.SEE_MASK_FLAG_NO_UI,
+            lpVerb="open",
+            lpFile=target,
+            lpParameters=parameters or "",
+            nShow=win32con.SW_SHOWNORMAL
+        )
+    
+    def _open_file(self, file_path: str) -> Dict[str, Any]:
         """Open a file with default application"""
-        try:
-            os.startfile(file_path)
-            return {
-                "success": True,
-                "message": f"Opened file: {file_path}",
-                "data": {"path": file_path}
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"Failed to open file: {str(e)}"
-            }
+        self._shell_open(file_path)
+        return {
+            "success": True,
+            "message": f"Opened file: {file_path}",
+            "data": {"path": file_path}
+        }
     
     async def _run_powershell(self, script: str) -> Dict[str, Any]:
         """Execute PowerShell command"""
+        # -NoProfile skips loading the user's profile scripts on every command
+        proc = await asyncio.create_subprocess_exec(
+            "powershell", "-NoProfile", "-Command", script,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
         try:
-            result = subprocess.run(
-                ["powershell", "-Command", script],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            return {
-                "success": result.returncode == 0,
-                "message": "PowerShell command executed",
-                "data": {
-                    "stdout": result.stdout,
-                    "stderr": result.stderr,
-                    "returncode": result.returncode
-                }
-            }
-        except Exception as e:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=POWERSHELL_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
             return {
                 "success": False,
-                "message": f"PowerShell execution failed: {str(e)}"
+                "message": f"PowerShell command timed out after {POWERSHELL_TIMEOUT} seconds"
             }
+        
+        return {
+            "success": proc.returncode == 0,
+            "message": "PowerShell command executed",
+            "data": {
+                "stdout": stdout.decode(errors="replace"),
+                "stderr": stderr.decode(errors="replace"),
+                "returncode": proc.returncode
+            }
+        }
     
-    async def _type_text(self, text: str) -> Dict[str, Any]:
+    def _type_text(self, text: str) -> Dict[str, Any]:
         """Type text using keyboard automation"""
-        try:
+        # One batched SendInput instead of a hook call per character
+        if not _send_unicode_text(text):
+            # Injection was blocked outright (e.g. UIPI); keyboard may still get through
             keyboard.write(text)
-            return {
-                "success": True,
-                "message": f"Typed text: {text[:50]}{'...' if len(text) > 50 else ''}",
-                "data": {"text": text}
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"Failed to type text: {str(e)}"
-            }
+        return {
+            "success": True,
+            "message": f"Typed text: {text[:50]}{'...' if len(text) > 50 else ''}",
+            "data": {"text": text}
+        }
     
-    async def _press_key(self, key: str) -> Dict[str, Any]:
+    def _press_key(self, key: str) -> Dict[str, Any]:
         """Press a key or key combination"""
-        try:
-            keyboard.press_and_release(key)
-            return {
-                "success": True,
-                "message": f"Pressed key: {key}",
-                "data": {"key": key}
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"Failed to press key: {str(e)}"
-            }
+        keyboard.press_and_release(key)
+        return {
+            "success": True,
+            "message": f"Pressed key: {key}",
+            "data": {"key": key}
+        }
     
-    async def _shutdown(self) -> Dict[str, Any]:
+    def _shutdown(self) -> Dict[str, Any]:
         """Shutdown the computer"""
-        try:
-            subprocess.run(["shutdown", "/s", "/t", "5"], check=True)
-            return {
-                "success": True,
-                "message": "Computer shutting down in 5 seconds",
-                "data": {"action": "shutdown"}
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"Failed to shutdown: {str(e)}"
-            }
+        subprocess.run(["shutdown", "/s", "/t", "5"], check=True)
+        return {
+            "success": True,
+            "message": "Computer shutting down in 5 seconds",
+            "data": {"action": "shutdown"}
+        }
     
-    async def _lock_workstation(self) -> Dict[str, Any]:
+    def _lock_workstation(self) -> Dict[str, Any]:
         """Lock the workstation"""
-        try:
-            win32api.LockWorkStation()
-            return {
-                "success": True,
-                "message": "Workstation locked",
-                "data": {"action": "lock"}
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "message": f"Failed to lock workstation: {str(e)}"
-            }
+        win32api.LockWorkStation()
+        return {
+            "success": True,
+            "message": "Workstation locked",
+            "data": {"action": "lock"}
+        }
     
     def get_pending_commands(self) -> List[Dict[str, Any]]:
         """Get list of pending commands waiting for confirmation"""
-        current_time = time.time()
-        pending = []
+        current_time = time.monotonic()
         
-        for cmd_id, cmd in self.pending_commands.items():
-            if current_time - cmd.timestamp <= self.command_timeout:
-                pending.append({
-                    "id": cmd_id,
-                    "command": cmd.command,
-                    "description": cmd.description,
-                    "risk_level": cmd.risk_level.value,
-                    "time_remaining": self.command_timeout - (current_time - cmd.timestamp)
-                })
-        
-        return pending
\ No newline at end of file
+        # The TTLCache only yields live entries, so no timeout filter is needed
+        return [
+            {
+                "id": cmd_id,
+                "command": cmd.command,
+                "description": cmd.description,
+                "risk_level": cmd.risk_level.value,
+                "time_remaining": cmd.expires_at - current_time
+            }
+            for cmd_id, cmd in self.pending_commands.items()
+        ]
\ No newline at end of file
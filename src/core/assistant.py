@@ -1,13 +1,40 @@
 import asyncio
+import itertools
 import logging
-from typing import Optional, List, Dict, Any
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Set, Deque, List, Tuple
 import time
 
 from ..config.settings import AssistantSettings
-from ..ai.ollama_client import OllamaClient, OllamaResponse
+from ..ai.ollama_client import OllamaClient
 from ..speech.recognition import SpeechRecognitionManager, SpeechEngine
 from ..control.device_controller import WindowsDeviceController, CommandRiskLevel
-from ..memory.mem0_client import Mem0Client, format_memories_for_context
+from ..memory.mem0_client import Mem0Client
+
+# Text-to-speech
+try:
+    import pyttsx3
+    TTS_AVAILABLE = True
+except ImportError:
+    TTS_AVAILABLE = False
+
+# COM, needed by pyttsx3's SAPI5 driver on the TTS thread
+try:
+    import pythoncom
+    COM_AVAILABLE = True
+except ImportError:
+    COM_AVAILABLE = False
+
+# Action keywords in AI replies, each matched in a single pass over the text.
+# When several apps or system commands are mentioned, the one listed first
+# below wins, wherever it appears in the reply
+_LAUNCH_RE = re.compile(r"\b(?:launch|open)\w*", re.IGNORECASE)
+_APP_RE = re.compile(r"\b(calculator|notepad|chrome|explorer)\b", re.IGNORECASE)
+_APPS = ("calculator", "notepad", "chrome", "explorer")
+_SYS_RE = re.compile(r"\b(shutdown|restart|lock)\b", re.IGNORECASE)
+_SYS_COMMANDS = {"shutdown": "shutdown", "restart": "restart", "lock": "lock_workstation"}
 
 class WindowsAIAssistant:
     """
@@ -18,23 +45,7 @@ class WindowsAIAssistant:
     - Text-to-speech responses
     """
     
-    def __init__(self, config: AssistantSettings):
-        self.config = config
-        self.logger = logging.getLogger(__name__)
-        
-        # Initialize components
-        self.ollama_client: Optional[OllamaClient] = None
-        self.speech_manager: Optional[SpeechRecognitionManager] = None
-        self.device_controller: Optional[WindowsDeviceController] = None
-        self.mem0_client: Optional[Mem0Client] = None
-        
-        # State management
-        self.is_running = False
-        self.conversation_history: List[Dict[str, str]] = []
-        self.last_interaction_time = time.time()
-        
-        # System prompt for the AI model
-        self.system_prompt = """You are a Windows AI Assistant with full control over the user's workstation. 
+    _BASE_PROMPT = """You are a Windows AI Assistant with full control over the user's workstation. 
         
 Your capabilities include:
 - Launching applications and managing processes
@@ -61,7 +72,9 @@ Response Format:
 Available commands include: launch_app, open_file, delete_file, run_powershell, type_text, press_key, 
 click_mouse, shutdown, restart, lock_workstation, kill_process, and many others.
 
-Remember: You have great power - use it responsibly and always prioritize user safety.
+Remember: You have great power - use it responsibly and always prioritize user safety."""
+    
+    _MEMORY_ADDENDUM = """
 
 PERSISTENT MEMORY CONTEXT:
 You have access to persistent memory across 7,800+ interactions stored in Neo4J knowledge graph.
@@ -71,6 +84,47 @@ Before responding, relevant past memories are included below. Use them to:
 - Provide consistent, informed responses
 - Build on previous knowledge about the user's preferences and patterns"""
     
+    def __init__(self, config: AssistantSettings):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        
+        # Initialize components
+        self.ollama_client: Optional[OllamaClient] = None
+        self.speech_manager: Optional[SpeechRecognitionManager] = None
+        self.device_controller: Optional[WindowsDeviceController] = None
+        self.mem0_client: Optional[Mem0Client] = None
+        
+        # State management
+        self.is_running = False
+        self._stop_event = asyncio.Event()
+        self._confirm_kw_cf = config.confirmation_keyword.casefold()
+        # Last 10 exchanges; older messages drop off as new ones are appended
+        self.conversation_history: Deque[Dict[str, str]] = deque(maxlen=20)
+        self.last_interaction_time = time.time()
+        
+        # pyttsx3 blocks in runAndWait and its engine belongs to the thread that
+        # created it, so all speech runs on one dedicated worker thread. That
+        # thread enters a COM apartment first, since SAPI is created on it
+        self._tts_executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="tts",
+            initializer=pythoncom.CoInitialize if COM_AVAILABLE else None
+        )
+        self._tts_engine = None
+        
+        # In-flight mem0 writes, awaited on shutdown so none are lost
+        self._pending_stores: Set[asyncio.Task] = set()
+        
+        # System prompt for the AI model; the memory section is only sent when
+        # persistent memory is in use
+        self._mem_enabled = bool(config.enable_persistent_memory)
+        self.system_prompt = self._BASE_PROMPT + (self._MEMORY_ADDENDUM if self._mem_enabled else "")
+        
+        # Static system message sent unchanged every turn so Ollama's prompt
+        # prefix cache can reuse its KV state; memories go in a separate message
+        self._system_prompt_msg = {"role": "system", "content": self.system_prompt}
+        self._memory_ctx_msg: Optional[Dict[str, str]] = None
+    
     async def start(self):
         """Start the AI Assistant"""
         self.logger.info("Starting Windows AI Assistant...")
@@ -79,7 +133,8 @@ Before responding, relevant past memories are included below. Use them to:
             # Initialize Ollama client
             self.ollama_client = OllamaClient(
                 host=self.config.ollama_host,
-                port=self.config.ollama_port
+                port=self.config.ollama_port,
+                socket_path=self.config.ollama_socket_path
             )
             
             async with self.ollama_client:
@@ -95,7 +150,8 @@ Before responding, relevant past memories are included below. Use them to:
                     engine=speech_engine,
                     wake_word=self.config.wake_word,
                     whisper_model=self.config.whisper_model,
-                    use_directml=self.config.use_directml
+                    use_directml=self.config.use_directml,
+                    compute_type=self.config.whisper_compute_type
                 )
                 
                 if not await self.speech_manager.initialize():
@@ -112,7 +168,7 @@ Before responding, relevant past memories are included below. Use them to:
                 self.logger.info("Device controller initialized")
                 
                 # Initialize mem0 client for persistent memory if enabled
-                if self.config.enable_persistent_memory:
+                if self._mem_enabled:
                     try:
                         self.mem0_client = Mem0Client(
                             mem0_api_url=self.config.mem0_api_url,
@@ -126,10 +182,10 @@ Before responding, relevant past memories are included below. Use them to:
                             self.logger.info("Connected to mem0 persistent memory system")
                         else:
                             self.logger.warning("Failed to connect to mem0, continuing without persistent memory")
-                            self.mem0_client = None
+                            self._disable_memory()
                     except Exception as e:
                         self.logger.warning(f"mem0 initialization failed: {e}, continuing without persistent memory")
-                        self.mem0_client = None
+                        self._disable_memory()
                 
                 # Set up speech callbacks
                 self.speech_manager.set_wake_word_callback(self._on_wake_word)
@@ -143,22 +199,28 @@ Before responding, relevant past memories are included below. Use them to:
                 self.logger.info("🤖 Windows AI Assistant is now active and listening...")
                 await self._speak_response("Windows AI Assistant activated. I'm listening for commands.")
                 
-                # Main loop
-                while self.is_running:
-                    await asyncio.sleep(1)
-                    
-                    # Clean up old conversation history (keep last 10 exchanges)
-                    if len(self.conversation_history) > 20:
-                        self.conversation_history = self.conversation_history[-20:]
-                        
+                # Main loop: idle without waking until stop() is called
+                await self._stop_event.wait()
+                
         except Exception as e:
             self.logger.error(f"Failed to start assistant: {e}")
             raise
     
+    def _disable_memory(self):
+        """Run without persistent memory and drop it from the system prompt"""
+        self.mem0_client = None
+        self._mem_enabled = False
+        self.system_prompt = self._BASE_PROMPT
+        self._system_prompt_msg = {"role": "system", "content": self.system_prompt}
+    
     async def stop(self):
         """Stop the AI Assistant"""
         self.logger.info("Stopping Windows AI Assistant...")
         self.is_running = False
+        self._stop_event.set()
+        
+        if self._pending_stores:
+            await asyncio.gather(*self._pending_stores, return_exceptions=True)
         
         if self.mem0_client:
             await self.mem0_client.disconnect()
@@ -167,6 +229,7 @@ Before responding, relevant past memories are included below. Use them to:
             await self.speech_manager.cleanup()
         
         await self._speak_response("Windows AI Assistant shutting down.")
+        self._tts_executor.shutdown(wait=False)
     
     async def _on_wake_word(self):
         """Handle wake word detection"""
@@ -179,7 +242,7 @@ Before responding, relevant past memories are included below. Use them to:
         
         try:
             # Check if this is a confirmation
-            if self.config.confirmation_keyword.lower() in command_text.lower():
+            if self._confirm_kw_cf in command_text.casefold():
                 result = await self.device_controller.confirm_command(command_text)
                 await self._speak_response(result["message"])
                 return
@@ -190,127 +253,153 @@ Before responding, relevant past memories are included below. Use them to:
                 "content": command_text
             })
             
-            # Get AI response with memory context
-            response = await self._get_ai_response(command_text)
+            # Stream the AI response with memory context; each sentence is
+            # queued for speech as soon as it is complete
+            reply, speech = await self._stream_ai_response(command_text)
             
             # Add AI response to history
             self.conversation_history.append({
                 "role": "assistant", 
-                "content": response.content
+                "content": reply
             })
             
-            # Store interaction in mem0 if enabled
-            if self.mem0_client and self.mem0_client.is_connected:
-                try:
-                    await self.mem0_client.store_interaction(
-                        user_input=command_text,
-                        assistant_response=response.content,
-                        topic="voice_command",
-                        metadata={
-                            "model": self.config.ollama_model,
-                            "timestamp": str(time.time()),
-                            "device": "voice_assistant"
-                        }
-                    )
-                    self.logger.info("Stored interaction in mem0")
-                except Exception as e:
-                    self.logger.warning(f"Failed to store interaction in mem0: {e}")
+            # Store interaction in mem0 in the background, overlapping the HTTP
+            # round-trip with command parsing and speech
+            if self._mem_enabled and self.mem0_client.is_connected:
+                store_task = asyncio.create_task(self.mem0_client.store_interaction(
+                    user_input=command_text,
+                    assistant_response=reply,
+                    topic="voice_command",
+                    metadata={
+                        "model": self.config.ollama_model,
+                        "timestamp": str(time.time()),
+                        "device": "voice_assistant"
+                    }
+                ))
+                self._pending_stores.add(store_task)
+                store_task.add_done_callback(self._on_store_done)
             
-            # Parse and execute any commands from AI response
-            await self._process_ai_response(response.content)
-            
-            # Speak the response
-            await self._speak_response(response.content)
+            # Parse and execute any commands from AI response while speaking it
+            await asyncio.gather(
+                self._process_ai_response(reply),
+                speech
+            )
             
         except Exception as e:
             self.logger.error(f"Error processing command: {e}")
             await self._speak_response("I'm sorry, I encountered an error processing that command.")
     
-    async def _get_ai_response(self, user_input: str) -> OllamaResponse:
-        """Get response from AI model with persistent memory context"""
+    def _on_store_done(self, task: asyncio.Task):
+        """Log the outcome of a background mem0 write"""
+        self._pending_stores.discard(task)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.logger.warning(f"Failed to store interaction in mem0: {task.exception()}")
+        elif task.result():
+            self.logger.info("Queued interaction for mem0")
+    
+    async def _build_messages(self, user_input: str) -> List[Dict[str, str]]:
+        """Assemble chat messages: system prompt, persistent memory context, recent history"""
+        # Retrieve relevant memories if mem0 is enabled
+        memory_msg = None
+        if self._mem_enabled and self.mem0_client.is_connected:
+            try:
+                # Search memories by semantic similarity to user input
+                memory_context = await self.mem0_client.prepare_context(
+                    query=user_input,
+                    limit=self.config.memory_context_limit
+                )
+                
+                if memory_context:
+                    # Same memories as last turn come back as the same string
+                    if self._memory_ctx_msg is None or self._memory_ctx_msg["content"] is not memory_context:
+                        self._memory_ctx_msg = {"role": "system", "content": memory_context}
+                    memory_msg = self._memory_ctx_msg
+                    self.logger.info("Injected relevant memories into context")
+            except Exception as e:
+                self.logger.warning(f"Error retrieving memories: {e}")
+        
+        # Prepare conversation for chat API: stable prefix first
+        messages = [self._system_prompt_msg]
+        if memory_msg:
+            messages.append(memory_msg)
+        # Last 10 exchanges for context
+        history = self.conversation_history
+        messages += itertools.islice(history, max(0, len(history) - 10), None)
+        return messages
+    
+    async def _stream_ai_response(self, user_input: str) -> Tuple[str, asyncio.Future]:
+        """
+        Stream the AI reply and start speaking each sentence as it arrives.
+        Returns the full reply text and a future that completes when all of
+        it has been spoken.
+        """
+        sentences: List[str] = []
+        speech: List[asyncio.Task] = []
         try:
-            # Retrieve relevant memories if mem0 is enabled
-            memory_context = ""
-            if self.mem0_client and self.mem0_client.is_connected:
-                try:
-                    # Search memories by semantic similarity to user input
-                    memories = await self.mem0_client.retrieve_memories_by_query(
-                        query=user_input,
-                        limit=self.config.memory_context_limit
-                    )
-                    
-                    if memories:
-                        memory_context = format_memories_for_context(memories)
-                        self.logger.info(f"Retrieved {len(memories)} relevant memories for context injection")
-                except Exception as e:
-                    self.logger.warning(f"Error retrieving memories: {e}")
-            
-            # Prepare conversation for chat API
-            system_message = self.system_prompt
-            if memory_context:
-                system_message += f"\n{memory_context}"
-            
-            messages = [
-                {"role": "system", "content": system_message}
-            ] + self.conversation_history[-10:]  # Last 10 exchanges for context
-            
-            response = await self.ollama_client.chat(
+            messages = await self._build_messages(user_input)
+            async for sentence in self.ollama_client.stream_sentences(
                 messages=messages,
                 model=self.config.ollama_model
-            )
-            
-            return response
-            
+            ):
+                sentences.append(sentence)
+                # The single TTS thread speaks queued sentences in order
+                speech.append(asyncio.create_task(self._speak_response(sentence)))
         except Exception as e:
             self.logger.error(f"Error getting AI response: {e}")
-            return OllamaResponse(
-                content="I'm sorry, I'm having trouble processing your request right now.",
-                model=self.config.ollama_model,
-                done=True
-            )
+        
+        if not sentences:
+            fallback = "I'm sorry, I'm having trouble processing your request right now."
+            sentences.append(fallback)
+            speech.append(asyncio.create_task(self._speak_response(fallback)))
+        
+        return " ".join(sentences), asyncio.gather(*speech)
     
     async def _process_ai_response(self, ai_response: str):
         """Parse AI response and execute any system commands"""
         # This is where we'd parse the AI response for action commands
         # For now, we'll implement a simple keyword-based system
         
-        response_lower = ai_response.lower()
-        
         # Simple command extraction (this could be made more sophisticated)
-        if "launch" in response_lower or "open" in response_lower:
-            # Extract application name
-            if "calculator" in response_lower:
-                await self.device_controller.execute_command("launch_app", app_name="calculator")
-            elif "notepad" in response_lower:
-                await self.device_controller.execute_command("launch_app", app_name="notepad")
-            elif "chrome" in response_lower:
-                await self.device_controller.execute_command("launch_app", app_name="chrome")
-            elif "explorer" in response_lower:
-                await self.device_controller.execute_command("launch_app", app_name="explorer")
-        
-        elif "shutdown" in response_lower:
-            await self.device_controller.execute_command("shutdown")
+        # A launch/open reply never falls through to system commands, even
+        # when it names no known app
+        if _LAUNCH_RE.search(ai_response):
+            mentioned = {name.lower() for name in _APP_RE.findall(ai_response)}
+            app = next((name for name in _APPS if name in mentioned), None)
+            if app:
+                await self.device_controller.execute_command("launch_app", app_name=app)
         
-        elif "restart" in response_lower:
-            await self.device_controller.execute_command("restart")
+        elif mentioned := {word.lower() for word in _SYS_RE.findall(ai_response)}:
+            word = next(word for word in _SYS_COMMANDS if word in mentioned)
+            await self.device_controller.execute_command(_SYS_COMMANDS[word])
         
-        elif "lock" in response_lower:
-            await self.device_controller.execute_command("lock_workstation")
-        
-        # Add more command parsing as needed
+        # Add more command parsing as needed (extend the patterns above)
     
     async def _speak_response(self, text: str):
-        """Convert text to speech (placeholder - implement with pyttsx3 or Windows SAPI)"""
-        # For now, just log the response
-        # In full implementation, this would use text-to-speech
+        """Convert text to speech on the TTS thread without blocking the event loop"""
         self.logger.info(f"🗣️ Assistant: {text}")
         print(f"🗣️ Assistant: {text}")
         
-        # TODO: Implement actual TTS
-        # import pyttsx3
-        # engine = pyttsx3.init()
-        # engine.say(text)
-        # engine.runAndWait()
+        if not TTS_AVAILABLE:
+            return
+        
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._tts_executor, self._tts_say, text
+            )
+        except Exception as e:
+            self.logger.warning(f"Text-to-speech failed: {e}")
+    
+    def _tts_say(self, text: str):
+        """Speak text, blocking until done (runs on the TTS worker thread)"""
+        if self._tts_engine is None:
+            self._tts_engine = pyttsx3.init()
+            self._tts_engine.setProperty("rate", self.config.tts_rate)
+            if self.config.tts_voice:
+                self._tts_engine.setProperty("voice", self.config.tts_voice)
+        self._tts_engine.say(text)
+        self._tts_engine.runAndWait()
     
     async def _on_speech_error(self, error: Exception):
         """Handle speech recognition errors"""
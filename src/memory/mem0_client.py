@@ -10,16 +10,53 @@ Architecture:
 """
 
 import asyncio
-import json
 import logging
-from typing import Optional, Dict, List, Any
+import random
+import time
+from types import MappingProxyType
+from typing import Optional, Dict, List, Any, Mapping, Tuple
 from datetime import datetime
 import aiohttp
+import orjson
 from aiohttp import ClientSession
+from cachetools import LRUCache, TTLCache
 import asyncio_contextmanager
 
 logger = logging.getLogger(__name__)
 
+# (normalized query, limit); tuples hash in C and compare exactly
+QueryKey = Tuple[str, int]
+
+# Semantic search results are reused for near-identical queries within a minute
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_TTL = 60
+
+# SSE memories kept locally; least recently updated entries are evicted first
+MEMORY_CACHE_SIZE = 2048
+
+# Interaction writes are queued and flushed in small concurrent batches
+WRITE_QUEUE_SIZE = 1024
+WRITE_BATCH_SIZE = 16
+WRITE_BATCH_WINDOW = 0.25  # seconds to wait for more writes to coalesce
+
+# Background /health probing; connect() no longer waits on the first probe
+HEALTH_CHECK_INTERVAL = 30
+HEALTH_CHECK_TIMEOUT = 2
+
+# Caps concurrent REST calls; searches short-circuit to [] for a cooldown
+# after repeated consecutive failures (degraded mode)
+MAX_CONCURRENT_REQUESTS = 8
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 10.0
+
+# SSE reconnect backoff (seconds) and the give-up point during long outages
+SSE_BACKOFF_INITIAL = 1.0
+SSE_BACKOFF_MAX = 60.0
+SSE_MAX_CONSECUTIVE_FAILURES = 20
+
+# Request bodies are pre-encoded with orjson and sent as raw bytes
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
 
 class Mem0Client:
     """
@@ -47,15 +84,37 @@ class Mem0Client:
         """
         self.mem0_api_url = mem0_api_url
         self.mem0_api_key = mem0_api_key
+        # Skip the header entirely for unauthenticated deployments
+        self._auth_headers: Dict[str, str] = (
+            {"Authorization": f"Bearer {mem0_api_key}"} if mem0_api_key else {}
+        )
         self.retrieval_agent_sse_url = (
             f"http://{retrieval_agent_host}:{retrieval_agent_sse_port}/stream"
         )
         self.enable_sse_streaming = enable_sse_streaming
         self.session: Optional[ClientSession] = None
         self.sse_task: Optional[asyncio.Task] = None
-        self.memory_cache: Dict[str, Any] = {}
+        self._writer_task: Optional[asyncio.Task] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._write_q: asyncio.Queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self.memory_cache: LRUCache = LRUCache(maxsize=MEMORY_CACHE_SIZE)
         self.is_connected = False
 
+        # LRU + TTL cache of /memories/search results, keyed by normalized query
+        self._query_cache: TTLCache = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+        self._query_cache_hits = 0
+        self._query_cache_misses = 0
+        # Searches currently on the wire, shared by identical concurrent queries
+        self._inflight: Dict[QueryKey, asyncio.Task] = {}
+        self._http_sem = asyncio.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        self._breaker_failures = 0
+        self._breaker_open_until = 0.0
+        # Last formatted context and the result list it was built from. Lists
+        # come from _query_cache, so the same object means the same memories;
+        # SSE updates clear that cache and yield a new list
+        self._context_source: Optional[List[Dict[str, Any]]] = None
+        self._context: str = ""
+
     async def __aenter__(self):
         """Context manager entry."""
         await self.connect()
@@ -69,25 +128,39 @@ class Mem0Client:
         """
         Connect to mem0 services and start SSE stream if enabled.
 
+        Connects optimistically: API health is probed in the background and
+        is_connected is cleared if the probe fails.
+
         Returns:
-            bool: True if connection successful
+            bool: True if the session and background tasks were started
         """
         try:
-            self.session = aiohttp.ClientSession()
-
-            # Test REST API connection
-            if not await self._check_api_health():
-                logger.error("mem0 REST API health check failed")
-                return False
+            # One pooled session for every call: keep-alive connections and
+            # cached DNS so bursts of requests skip TCP/TLS setup
+            connector = aiohttp.TCPConnector(
+                limit=32,
+                limit_per_host=16,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self._auth_headers,
+                timeout=aiohttp.ClientTimeout(total=10),
+            )
 
-            logger.info("Connected to mem0 REST API")
+            self.is_connected = True
+            self._health_task = asyncio.create_task(
+                self._health_loop(HEALTH_CHECK_INTERVAL)
+            )
+            self._writer_task = asyncio.create_task(self._writer_loop())
 
             # Start SSE streaming if enabled
             if self.enable_sse_streaming:
                 self.sse_task = asyncio.create_task(self._subscribe_to_sse_stream())
                 logger.info("SSE stream subscription started (5-second retrieval loop)")
 
-            self.is_connected = True
             return True
 
         except Exception as e:
@@ -96,6 +169,25 @@ class Mem0Client:
 
     async def disconnect(self) -> None:
         """Disconnect from mem0 services."""
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+
+        if self._writer_task:
+            # Flush queued interactions before the session goes away
+            try:
+                await asyncio.wait_for(self._write_q.join(), timeout=10)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self._write_q.qsize()} unsent mem0 interactions")
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+
         if self.sse_task:
             self.sse_task.cancel()
             try:
@@ -114,50 +206,95 @@ class Mem0Client:
         try:
             async with self.session.get(
                 f"{self.mem0_api_url}/health",
-                timeout=aiohttp.ClientTimeout(total=5),
+                timeout=aiohttp.ClientTimeout(total=HEALTH_CHECK_TIMEOUT),
             ) as resp:
                 return resp.status == 200
         except Exception as e:
-            logger.error(f"mem0 API health check error: {e}")
+            # Runs every probe; _health_loop reports the transition once
+            logger.debug(f"mem0 API health check error: {e}")
             return False
 
+    async def _health_loop(self, interval: float) -> None:
+        """Probe REST API health periodically and keep is_connected current."""
+        was_healthy: Optional[bool] = None
+        while True:
+            healthy = await self._check_api_health()
+            if healthy != was_healthy:
+                # Log transitions only, not every probe
+                if healthy:
+                    logger.info("Connected to mem0 REST API")
+                else:
+                    logger.error("mem0 REST API health check failed")
+                was_healthy = healthy
+            self.is_connected = healthy
+            await asyncio.sleep(interval)
+
     async def _subscribe_to_sse_stream(self) -> None:
         """
         Subscribe to retrieval agent SSE stream (5-second loop).
         Processes memory extraction events in real-time.
+
+        Reconnects with capped, jittered exponential backoff; gives up after
+        SSE_MAX_CONSECUTIVE_FAILURES attempts in a row without an event.
         """
+        backoff = SSE_BACKOFF_INITIAL
+        failures = 0
         while True:
+            received = False
             try:
                 async with self.session.get(
                     self.retrieval_agent_sse_url,
                     timeout=aiohttp.ClientTimeout(total=300),  # 5-minute timeout
                 ) as resp:
                     if resp.status != 200:
-                        logger.warning(
-                            f"SSE stream returned {resp.status}, retrying..."
-                        )
-                        await asyncio.sleep(5)
-                        continue
-
-                    async for line in resp.content:
-                        if not line:
-                            continue
-
-                        try:
-                            line_str = line.decode().strip()
-                            if line_str.startswith("data:"):
-                                json_data = line_str[5:].strip()
-                                event = json.loads(json_data)
-                                await self._process_sse_event(event)
-                        except json.JSONDecodeError as e:
-                            logger.debug(f"SSE parse error: {e}")
-                            continue
+                        logger.warning(f"SSE stream returned {resp.status}")
+                    else:
+                        # Collect an event's data fields line by line (LF or CRLF
+                        # endings) and dispatch it on the terminating blank line
+                        data_lines: List[bytes] = []
+                        async for line in resp.content:
+                            line = line.rstrip(b"\r\n")
+                            if line:
+                                if line.startswith(b"data:"):
+                                    data_lines.append(line[5:])
+                                continue
+                            if not data_lines:
+                                continue
+
+                            data = b"\n".join(data_lines)
+                            data_lines = []
+
+                            if not received:
+                                received = True
+                                backoff = SSE_BACKOFF_INITIAL
+                                failures = 0
+
+                            try:
+                                # orjson parses the bytes directly and skips surrounding whitespace
+                                await self._process_sse_event(orjson.loads(data))
+                            except orjson.JSONDecodeError as e:
+                                logger.debug(f"SSE parse error: {e}")
+                                continue
 
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"SSE stream error: {e}, reconnecting in 5s...")
-                await asyncio.sleep(5)
+                logger.error(f"SSE stream error: {e}")
+
+            if received:
+                continue  # Healthy stream ended; reconnect right away
+
+            failures += 1
+            if failures >= SSE_MAX_CONSECUTIVE_FAILURES:
+                logger.error(
+                    f"SSE stream failed {failures} times in a row, disabling subscription"
+                )
+                return
+
+            delay = backoff + random.uniform(0, backoff * 0.3)
+            logger.info(f"Reconnecting to SSE stream in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, SSE_BACKOFF_MAX)
 
     async def _process_sse_event(self, event: Dict[str, Any]) -> None:
         """
@@ -172,6 +309,10 @@ class Mem0Client:
             if memory_id:
                 self.memory_cache[memory_id] = event
                 logger.debug(f"Cached memory {memory_id} from SSE stream")
+
+            # New or changed memories can alter any search result
+            if event.get("topic") or event.get("invalidate"):
+                self._query_cache.clear()
         except Exception as e:
             logger.error(f"Error processing SSE event: {e}")
 
@@ -193,28 +334,83 @@ class Mem0Client:
             logger.warning("Not connected to mem0")
             return []
 
+        key = _query_key(query, limit)
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            self._query_cache_hits += 1
+            return cached
+        self._query_cache_misses += 1
+
+        if time.monotonic() < self._breaker_open_until:
+            return []
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._search_memories(key, query, limit))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller being cancelled doesn't abort the shared request
+        return await asyncio.shield(task)
+
+    async def _search_memories(
+        self, key: QueryKey, query: str, limit: int
+    ) -> List[Dict[str, Any]]:
+        """POST a semantic search and cache a successful result under key."""
         try:
             payload = {"query": query, "limit": limit}
-            headers = {"Authorization": f"Bearer {self.mem0_api_key}"}
-
-            async with self.session.post(
+            async with self._http_sem, self.session.post(
                 f"{self.mem0_api_url}/memories/search",
-                json=payload,
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=10),
+                data=orjson.dumps(payload),
+                headers=_JSON_HEADERS,
             ) as resp:
                 if resp.status == 200:
-                    data = await resp.json()
+                    data = orjson.loads(await resp.read())
                     memories = data.get("memories", [])
                     logger.info(f"Retrieved {len(memories)} memories for query: {query}")
+                    self._query_cache[key] = memories
+                    self._breaker_failures = 0
                     return memories
                 else:
                     logger.error(f"Search failed with status {resp.status}")
-                    return []
 
         except Exception as e:
             logger.error(f"Error retrieving memories: {e}")
-            return []
+
+        self._record_search_failure()
+        return []
+
+    def _record_search_failure(self) -> None:
+        """Count a failed search; open the breaker once failures pile up."""
+        self._breaker_failures += 1
+        if self._breaker_failures >= BREAKER_FAILURE_THRESHOLD:
+            self._breaker_open_until = time.monotonic() + BREAKER_COOLDOWN
+            self._breaker_failures = 0
+            logger.warning(
+                f"mem0 search failing, skipping memory retrieval for {BREAKER_COOLDOWN:.0f}s"
+            )
+
+    async def prepare_context(self, query: str, limit: int = 5) -> str:
+        """
+        Retrieve memories for query and format them for LLM context injection.
+        Returns the previous string unchanged (same object) when the same
+        cached result list comes back, so callers and formatting work can
+        be skipped.
+
+        Args:
+            query: Search query (will be embedded for semantic search)
+            limit: Maximum memories to retrieve
+
+        Returns:
+            Formatted memory context, or "" when nothing relevant was found
+        """
+        memories = await self.retrieve_memories_by_query(query, limit)
+        if not memories:
+            return ""
+
+        if memories is not self._context_source:
+            self._context = format_memories_for_context(memories)
+            self._context_source = memories
+        return self._context
 
     async def retrieve_memories_by_topic(
         self, topic: str, limit: int = 5
@@ -235,16 +431,12 @@ class Mem0Client:
             return []
 
         try:
-            headers = {"Authorization": f"Bearer {self.mem0_api_key}"}
-
-            async with self.session.get(
+            async with self._http_sem, self.session.get(
                 f"{self.mem0_api_url}/memories/by-topic",
                 params={"topic": topic, "limit": limit},
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=10),
             ) as resp:
                 if resp.status == 200:
-                    data = await resp.json()
+                    data = orjson.loads(await resp.read())
                     memories = data.get("memories", [])
                     logger.info(
                         f"Retrieved {len(memories)} memories for topic: {topic}"
@@ -266,8 +458,8 @@ class Mem0Client:
         metadata: Optional[Dict[str, Any]] = None,
     ) -> bool:
         """
-        Store interaction (user input + assistant response) to mem0.
-        Injects into Neo4J, Vector DB, and Postgres.
+        Queue interaction (user input + assistant response) for storage in mem0.
+        Injects into Neo4J, Vector DB, and Postgres via the background writer.
 
         Args:
             user_input: User's voice command/question
@@ -276,27 +468,51 @@ class Mem0Client:
             metadata: Additional metadata (device, timestamp, etc)
 
         Returns:
-            bool: True if storage successful
+            bool: True if the interaction was queued
         """
         if not self.is_connected:
             logger.warning("Not connected to mem0")
             return False
 
+        payload = {
+            "user_input": user_input,
+            "assistant_response": assistant_response,
+            "topic": topic or "general",
+            "timestamp": datetime.utcnow().isoformat(),
+            "metadata": metadata or {},
+        }
+        await self._write_q.put(payload)
+        return True
+
+    async def _writer_loop(self) -> None:
+        """
+        Drain the write queue, coalescing bursts into batches of concurrent
+        POSTs over the pooled keep-alive connections.
+        """
+        while True:
+            batch = [await self._write_q.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._write_q.get(), WRITE_BATCH_WINDOW)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await asyncio.gather(*(self._post_interaction(p) for p in batch))
+            finally:
+                for _ in batch:
+                    self._write_q.task_done()
+
+    async def _post_interaction(self, payload: Dict[str, Any]) -> bool:
+        """POST a single interaction to mem0."""
+        topic = payload["topic"]
         try:
-            payload = {
-                "user_input": user_input,
-                "assistant_response": assistant_response,
-                "topic": topic or "general",
-                "timestamp": datetime.utcnow().isoformat(),
-                "metadata": metadata or {},
-            }
-            headers = {"Authorization": f"Bearer {self.mem0_api_key}"}
-
-            async with self.session.post(
+            async with self._http_sem, self.session.post(
                 f"{self.mem0_api_url}/memories",
-                json=payload,
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=10),
+                data=orjson.dumps(payload),
+                headers=_JSON_HEADERS,
             ) as resp:
                 if resp.status in (200, 201):
                     logger.info(f"Stored interaction in mem0: {topic}")
@@ -328,16 +544,12 @@ class Mem0Client:
             return {}
 
         try:
-            headers = {"Authorization": f"Bearer {self.mem0_api_key}"}
-
-            async with self.session.get(
+            async with self._http_sem, self.session.get(
                 f"{self.mem0_api_url}/knowledge-graph/{entity}",
                 params={"depth": depth},
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=10),
             ) as resp:
                 if resp.status == 200:
-                    return await resp.json()
+                    return orjson.loads(await resp.read())
                 else:
                     logger.error(f"Knowledge graph query failed with status {resp.status}")
                     return {}
@@ -346,17 +558,32 @@ class Mem0Client:
             logger.error(f"Error retrieving knowledge graph: {e}")
             return {}
 
-    def get_cached_memories(self) -> Dict[str, Any]:
-        """Get all cached memories from SSE stream."""
-        return self.memory_cache.copy()
+    def get_cached_memories(self) -> Mapping[str, Any]:
+        """Get a read-only view of cached memories from SSE stream."""
+        return MappingProxyType(self.memory_cache)
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Get query cache size and hit/miss counters."""
+        return {
+            "query_cache_size": len(self._query_cache),
+            "query_cache_hits": self._query_cache_hits,
+            "query_cache_misses": self._query_cache_misses,
+            "memory_cache_size": len(self.memory_cache),
+        }
 
     async def clear_cache(self) -> None:
-        """Clear local memory cache."""
+        """Clear local memory and query caches."""
         self.memory_cache.clear()
+        self._query_cache.clear()
         logger.info("Memory cache cleared")
 
 
-async def format_memories_for_context(memories: List[Dict[str, Any]]) -> str:
+def _query_key(query: str, limit: int) -> QueryKey:
+    """Cache key for a search: case/whitespace-insensitive query plus limit."""
+    return (query.strip().lower(), limit)
+
+
+def format_memories_for_context(memories: List[Dict[str, Any]]) -> str:
     """
     Format retrieved memories for LLM context injection.
 
@@ -369,11 +596,11 @@ async def format_memories_for_context(memories: List[Dict[str, Any]]) -> str:
     if not memories:
         return ""
 
-    context = "\n### Relevant Memory Context ###\n"
+    parts = ["\n### Relevant Memory Context ###\n"]
     for i, mem in enumerate(memories, 1):
-        context += f"\n{i}. {mem.get('content', mem.get('text', ''))}\n"
+        parts.append(f"\n{i}. {mem.get('content', mem.get('text', ''))}\n")
         if metadata := mem.get("metadata"):
-            context += f"   [Topic: {metadata.get('topic', 'N/A')}]\n"
+            parts.append(f"   [Topic: {metadata.get('topic', 'N/A')}]\n")
 
-    context += "\n### End Memory Context ###\n"
-    return context
+    parts.append("\n### End Memory Context ###\n")
+    return "".join(parts)
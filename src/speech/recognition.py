@@ -1,11 +1,13 @@
 import asyncio
 import logging
 import json
-from typing import Optional, Callable, Dict, Any
+import re
+from typing import Optional, Callable, Dict, Any, List
 from enum import Enum
 import threading
-import queue
-import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
 # Windows Speech Recognition
 try:
@@ -19,11 +21,17 @@ except ImportError:
 try:
     import whisper
     import torch
-    import numpy as np
     WHISPER_AVAILABLE = True
 except ImportError:
     WHISPER_AVAILABLE = False
 
+# JIT-compiled audio preprocessing
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Audio capture
 try:
     import pyaudio
@@ -32,6 +40,113 @@ try:
 except ImportError:
     AUDIO_AVAILABLE = False
 
+# Seconds of captured audio kept between the PortAudio callback and the
+# processing thread; older samples are dropped if processing falls behind
+RING_SECONDS = 10
+
+# Energy VAD: windows below VAD_RATIO x the running noise floor (mean absolute
+# int16 amplitude) never reach Whisper
+VAD_RATIO = 3.0
+VAD_FLOOR_DECAY = 0.95
+VAD_MIN_NOISE_FLOOR = 50.0
+
+# int16 -> [-1, 1) scale as a float32 scalar, so the conversion runs as a
+# single float32 multiply loop instead of promoting through float64
+PCM_SCALE = np.float32(1.0 / 32768.0)
+
+# Trailing-silence trim: windows are cut 100 ms after their last voiced 20 ms
+# frame, so the encoder never sees the quiet tail
+VAD_FRAME_SECONDS = 0.02
+HUSH_PAD_SECONDS = 0.1
+
+# Words of the previous transcription given to Whisper as context across windows
+PROMPT_TAIL_WORDS = 32
+
+# Windows that pile up while Whisper is busy are decoded together in one
+# batched pass; beyond this many, the oldest are dropped
+MAX_BATCH_CLIPS = 4
+
+# transcribe()'s defaults for discarding a decoded window as non-speech
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+def _preprocess_pcm_numpy(src: np.ndarray, dst: np.ndarray, scale: np.float32) -> float:
+    """Two-pass fallback for preprocess_pcm when Numba is not installed"""
+    np.multiply(src, scale, out=dst)
+    return float(np.mean(np.abs(src, dtype=np.int32)))
+
+if NUMBA_AVAILABLE:
+    @numba.njit(cache=True, fastmath=True, boundscheck=False)
+    def preprocess_pcm(src, dst, scale):
+        """
+        Scale int16 samples into dst as float32 and return their mean absolute
+        int16 amplitude, in a single pass that LLVM vectorizes.
+        """
+        total = 0
+        for i in range(src.size):
+            sample = src[i]
+            dst[i] = sample * scale
+            total += abs(np.int64(sample))
+        return total / max(src.size, 1)
+else:
+    preprocess_pcm = _preprocess_pcm_numpy
+
+class SPSCAudioRing:
+    """
+    Single-producer/single-consumer ring of int16 samples.
+    The PortAudio callback is the only writer of _w and the processing thread
+    the only writer of _r, so no lock is needed: each index is a plain int,
+    rebinding it is atomic, and samples are stored before _w is published.
+    """
+    
+    def __init__(self, capacity: int, threshold: int = 1):
+        self._buf = np.empty(capacity, dtype=np.int16)
+        self._capacity = capacity
+        self._threshold = threshold  # Unread samples needed before signalling ready
+        self._w = 0  # Total samples written (producer only)
+        self._r = 0  # Total samples consumed (consumer only)
+        self.overruns = 0
+        self.ready = threading.Event()
+    
+    def available(self) -> int:
+        """Samples written but not yet consumed"""
+        return self._w - self._r
+    
+    def write(self, data: bytes):
+        """Producer: append samples, dropping them if the consumer is a full ring behind"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        n = samples.size
+        w = self._w
+        if n > self._capacity - (w - self._r):
+            self.overruns += 1
+        else:
+            start = w % self._capacity
+            first = min(n, self._capacity - start)
+            self._buf[start:start + first] = samples[:first]
+            self._buf[:n - first] = samples[first:]
+            self._w = w = w + n
+        if w - self._r >= self._threshold:
+            self.ready.set()
+    
+    def read_into(self, out: np.ndarray) -> int:
+        """Consumer: copy unread samples into out (up to its size) and return the count"""
+        r = self._r
+        n = min(self._w - r, out.size)
+        start = r % self._capacity
+        first = min(n, self._capacity - start)
+        out[:first] = self._buf[start:start + first]
+        out[first:n] = self._buf[:n - first]
+        self._r = r + n
+        return n
+
+def compile_wake_pattern(wake_word: str) -> re.Pattern:
+    """
+    Match the wake word as whole words, however the recognizer joins its
+    parts: "wolf-logic" also matches "wolf logic" and "wolflogic".
+    """
+    parts = [re.escape(part) for part in re.split(r"[-\s]+", wake_word.strip()) if part]
+    return re.compile(r"\b" + r"[-\s]*".join(parts) + r"\b", re.IGNORECASE)
+
 class SpeechEngine(Enum):
     WINDOWS_NATIVE = "windows_native"
     WHISPER_LOCAL = "whisper_local"
@@ -49,29 +164,57 @@ class SpeechRecognitionManager:
                  engine: SpeechEngine = SpeechEngine.WINDOWS_NATIVE,
                  wake_word: str = "assistant",
                  whisper_model: str = "base",
-                 use_directml: bool = True):
+                 use_directml: bool = True,
+                 compute_type: str = "auto"):
         self.engine = engine
         self.wake_word = wake_word.lower()
+        self._wake_re = compile_wake_pattern(self.wake_word)
         self.whisper_model = whisper_model
         self.use_directml = use_directml
+        self.compute_type = compute_type
+        self._fp16 = False
         self.logger = logging.getLogger(__name__)
         
         # State management
         self.is_listening = False
         self.is_wake_word_detected = False
-        self.audio_queue = queue.Queue()
-        self.callback_queue = queue.Queue()
+        
+        # Recognition results cross from the inference thread to the event
+        # loop through one queue, drained by a single dispatcher task
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._result_q: Optional[asyncio.Queue] = None
+        self._dispatch_task: Optional[asyncio.Task] = None
         
         # Audio configuration
         self.sample_rate = 16000
-        self.chunk_size = 1024
+        self.chunk_size = self.sample_rate // 5  # 200 ms per PortAudio callback
+        self.window_samples = self.sample_rate * 2  # Audio per recognition pass
         self.channels = 1
         self.audio_format = pyaudio.paInt16
         
+        # Captured audio: lock-free ring written by the PortAudio callback and
+        # read by the processing thread into int16 scratch, then scaled into
+        # float32 scratch in the same pass that measures its energy
+        self._ring = SPSCAudioRing(self.sample_rate * RING_SECONDS, threshold=self.window_samples)
+        self._pcm_scratch = np.empty(self.sample_rate * RING_SECONDS, dtype=np.int16)
+        self._f32_scratch = np.empty(self.sample_rate * RING_SECONDS, dtype=np.float32)
+        self._noise_floor = VAD_MIN_NOISE_FLOOR
+        
+        # Whisper runs on its own thread so capture never stalls behind a slow
+        # transcription; windows arriving while it is busy wait as one batch
+        self._infer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
+        self._infer_lock = threading.Lock()
+        self._infer_busy = False
+        self._pending_clips: deque = deque(maxlen=MAX_BATCH_CLIPS)
+        self._prompt_tail = ""  # Inference thread only
+        
         # Initialize components
         self.audio = None
         self.stream = None
         self.whisper_model_obj = None
+        self._mel_filters = None  # (n_mels, N_FFT // 2 + 1) on the model's device
+        self._hann = None  # STFT window on the model's device
+        self._audio_buf = None  # (MAX_BATCH_CLIPS, N_SAMPLES) float32 on the model's device
         self.windows_speech = None
         
         # Callbacks
@@ -82,6 +225,15 @@ class SpeechRecognitionManager:
     async def initialize(self) -> bool:
         """Initialize the speech recognition system"""
         try:
+            # Every engine preprocesses captured windows, so compile (or load
+            # from the on-disk cache) the kernel now, off the event loop,
+            # rather than on the first window
+            if NUMBA_AVAILABLE:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, preprocess_pcm,
+                    np.zeros(16, dtype=np.int16), np.empty(16, dtype=np.float32), PCM_SCALE
+                )
+            
             if self.engine == SpeechEngine.WINDOWS_NATIVE:
                 return await self._initialize_windows_speech()
             elif self.engine == SpeechEngine.WHISPER_LOCAL:
@@ -104,13 +256,9 @@ class SpeechRecognitionManager:
             return False
         
         try:
-            # Initialize COM for Windows Speech API
-            pythoncom.CoInitialize()
-            
-            # Create speech recognition engine
-            self.windows_speech = win32com.client.Dispatch("SAPI.SpVoice")
-            
-            # Initialize audio capture for wake word detection
+            # SAPI and its COM apartment are set up on the processing thread,
+            # the only thread that calls it. Here, only audio capture for
+            # wake word detection
             if AUDIO_AVAILABLE:
                 self.audio = pyaudio.PyAudio()
                 self.stream = self.audio.open(
@@ -150,6 +298,32 @@ class SpeechRecognitionManager:
                 device=device
             )
             
+            # Whisper's layers cast fp32 weights to the input dtype on every call;
+            # storing them in fp16 halves weight traffic and skips those casts.
+            # LayerNorm computes in fp32 regardless, so its weights stay fp32
+            compute_type = self.compute_type
+            if compute_type == "auto":
+                compute_type = "float16" if device == "cuda" else "float32"
+            if compute_type == "float16" and device != "cuda":
+                self.logger.warning("float16 Whisper needs a GPU, using float32")
+                compute_type = "float32"
+            if compute_type == "float16":
+                self.whisper_model_obj.half()
+                for module in self.whisper_model_obj.modules():
+                    if isinstance(module, torch.nn.LayerNorm):
+                        module.float()
+            self._fp16 = compute_type == "float16"
+            self.logger.info(f"Whisper running in {compute_type}")
+            
+            # whisper.log_mel_spectrogram rebuilds the Hann window and moves
+            # both it and the filterbank to the device on every call
+            self._mel_filters = whisper.audio.mel_filters(device, n_mels=self.whisper_model_obj.dims.n_mels)
+            self._hann = torch.hann_window(whisper.audio.N_FFT, device=device)
+            # Windows are copied straight into device memory, never reallocated
+            self._audio_buf = torch.zeros(MAX_BATCH_CLIPS, whisper.audio.N_SAMPLES, device=device)
+            
+            await self._compile_encoder(device)
+            
             # Initialize audio capture
             if AUDIO_AVAILABLE:
                 self.audio = pyaudio.PyAudio()
@@ -168,6 +342,43 @@ class SpeechRecognitionManager:
             self.logger.error(f"Failed to initialize Whisper: {e}")
             return False
     
+    async def _compile_encoder(self, device: str):
+        """
+        Compile the Whisper encoder; its input is always a batch of padded
+        30-s mel segments, so one specialized graph per batch size serves
+        every call. Compilation happens here on silent segments rather than
+        on the first command.
+        """
+        if not hasattr(torch, "compile"):
+            return
+        
+        model = self.whisper_model_obj
+        eager_encoder = model.encoder
+        try:
+            model.encoder = torch.compile(eager_encoder, mode="reduce-overhead", fullgraph=False)
+            # CUDA graphs are recorded per thread, so warm on the inference
+            # thread itself, at every batch size _transcribe_clips can send
+            await asyncio.get_running_loop().run_in_executor(
+                self._infer_pool, self._warm_encoder, device
+            )
+            self.logger.info("Whisper encoder compiled")
+        except Exception as e:
+            self.logger.warning(f"torch.compile unavailable for Whisper encoder, running eager: {e}")
+            model.encoder = eager_encoder
+    
+    def _warm_encoder(self, device: str):
+        """Inference thread: run the encoder once per batch size on silence"""
+        model = self.whisper_model_obj
+        dtype = torch.float16 if self._fp16 else torch.float32
+        with torch.no_grad():
+            for batch_size in range(1, MAX_BATCH_CLIPS + 1):
+                silence = torch.zeros(
+                    batch_size, model.dims.n_mels, whisper.audio.N_FRAMES,
+                    device=device,
+                    dtype=dtype
+                )
+                model.encoder(silence)
+    
     async def _initialize_whisper_server(self) -> bool:
         """Initialize connection to remote Whisper server"""
         # TODO: Implement Whisper server client
@@ -177,15 +388,35 @@ class SpeechRecognitionManager:
     def _audio_callback(self, in_data, frame_count, time_info, status):
         """Audio stream callback for continuous listening"""
         if self.is_listening:
-            self.audio_queue.put(in_data)
+            self._ring.write(in_data)
         return (in_data, pyaudio.paContinue)
     
+    def _read_window(self) -> np.ndarray:
+        """Consume all unread samples, returned as an int16 view into scratch"""
+        n = self._ring.read_into(self._pcm_scratch)
+        return self._pcm_scratch[:n]
+    
+    def _is_voiced(self, energy: float) -> bool:
+        """Energy gate against an adaptive noise floor, in int16 amplitude units"""
+        if energy >= VAD_RATIO * self._noise_floor:
+            return True
+        # Track the floor only on quiet windows so speech doesn't raise it
+        self._noise_floor = max(
+            VAD_MIN_NOISE_FLOOR,
+            VAD_FLOOR_DECAY * self._noise_floor + (1 - VAD_FLOOR_DECAY) * energy
+        )
+        return False
+    
     async def start_listening(self):
         """Start continuous speech recognition"""
         if not self.audio or not self.stream:
             self.logger.error("Audio system not initialized")
             return
         
+        self._loop = asyncio.get_running_loop()
+        self._result_q = asyncio.Queue()
+        self._dispatch_task = asyncio.create_task(self._dispatch_loop())
+        
         self.is_listening = True
         self.stream.start_stream()
         
@@ -199,55 +430,74 @@ class SpeechRecognitionManager:
     async def stop_listening(self):
         """Stop speech recognition"""
         self.is_listening = False
+        # Wake the processing thread so it sees the flag now
+        self._ring.ready.set()
         
         if self.stream:
             self.stream.stop_stream()
         
+        # Results already queued are dispatched before the dispatcher exits
+        if self._result_q is not None:
+            self._result_q.put_nowait(("stop", None))
+            self._result_q = None
+        
         self.logger.info("Stopped listening for speech")
     
     def _process_audio_loop(self):
         """Main audio processing loop running in separate thread"""
-        audio_buffer = []
-        last_speech_time = time.time()
+        com_initialized = False
+        if self.engine == SpeechEngine.WINDOWS_NATIVE and WINDOWS_SPEECH_AVAILABLE:
+            try:
+                # Free-threaded apartment on the thread that calls SAPI, so
+                # calls go straight to the object instead of through a proxy
+                pythoncom.CoInitializeEx(pythoncom.COINIT_MULTITHREADED)
+                com_initialized = True
+                self.windows_speech = win32com.client.Dispatch("SAPI.SpVoice")
+            except Exception as e:
+                self.logger.error(f"Failed to create Windows speech engine: {e}")
         
+        try:
+            self._run_audio_loop()
+        finally:
+            if com_initialized:
+                # Release the COM object before its apartment goes away
+                self.windows_speech = None
+                pythoncom.CoUninitialize()
+    
+    def _run_audio_loop(self):
+        """Consume captured windows until listening stops"""
         while self.is_listening:
             try:
-                # Get audio data with timeout
-                try:
-                    audio_data = self.audio_queue.get(timeout=0.1)
-                    audio_buffer.append(audio_data)
-                except queue.Empty:
+                # The callback signals once a full window has accumulated, and
+                # stop_listening signals to end the loop; the timeout is only
+                # a backstop, so the thread sleeps through silence
+                if not self._ring.ready.wait(timeout=1.0):
                     continue
+                self._ring.ready.clear()
+                if not self.is_listening:
+                    break
                 
-                # Process accumulated audio every 2 seconds or when buffer gets large
-                current_time = time.time()
-                if (current_time - last_speech_time > 2.0) or (len(audio_buffer) > 32):
-                    if audio_buffer:
-                        self._process_audio_chunk(audio_buffer)
-                        audio_buffer = []
-                        last_speech_time = current_time
+                pcm = self._read_window()
+                if pcm.size:
+                    self._process_audio_chunk(pcm)
                 
             except Exception as e:
                 self.logger.error(f"Error in audio processing loop: {e}")
     
-    def _process_audio_chunk(self, audio_buffer: list):
-        """Process a chunk of audio data for speech recognition"""
+    def _process_audio_chunk(self, pcm: np.ndarray):
+        """Process a window of int16 audio for speech recognition"""
         try:
-            # Convert audio buffer to numpy array
-            audio_data = b''.join(audio_buffer)
-            audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
+            audio = self._f32_scratch[:pcm.size]
+            energy = preprocess_pcm(pcm, audio, PCM_SCALE)
+            
+            # Silence never reaches the recognizer
+            if not self._is_voiced(energy):
+                return
             
             if self.engine == SpeechEngine.WHISPER_LOCAL and self.whisper_model_obj:
-                # Use Whisper for transcription
-                result = self.whisper_model_obj.transcribe(
-                    audio_np,
-                    language="en",
-                    task="transcribe"
-                )
-                
-                text = result.get("text", "").strip().lower()
-                if text:
-                    self._handle_transcription(text)
+                # audio is a view into scratch the next window reuses
+                end = self._trim_trailing_silence(pcm).size
+                self._submit_transcription(audio[:end].copy())
             
             elif self.engine == SpeechEngine.WINDOWS_NATIVE:
                 # For Windows native, we'd use the COM API here
@@ -258,27 +508,122 @@ class SpeechRecognitionManager:
         except Exception as e:
             self.logger.error(f"Error processing audio chunk: {e}")
     
+    def _trim_trailing_silence(self, pcm: np.ndarray) -> np.ndarray:
+        """Cut the window shortly after its last voiced frame"""
+        frame = int(self.sample_rate * VAD_FRAME_SECONDS)
+        n_frames = pcm.size // frame
+        if not n_frames:
+            return pcm
+        energies = np.abs(pcm[:n_frames * frame].reshape(n_frames, frame), dtype=np.int32).mean(axis=1)
+        voiced = np.flatnonzero(energies >= VAD_RATIO * self._noise_floor)
+        if not voiced.size:
+            return pcm
+        end = (int(voiced[-1]) + 1) * frame + int(self.sample_rate * HUSH_PAD_SECONDS)
+        return pcm[:end]
+    
+    def _submit_transcription(self, audio: np.ndarray):
+        """Hand a float32 window to the inference thread, or queue it while Whisper is busy"""
+        with self._infer_lock:
+            if self._infer_busy:
+                self._pending_clips.append(audio)
+                return
+            self._infer_busy = True
+        self._infer_pool.submit(self._run_whisper, [audio])
+    
+    def _run_whisper(self, clips: List[np.ndarray]):
+        """Inference thread: transcribe windows until none are waiting"""
+        while clips:
+            try:
+                for text in self._transcribe_clips(clips):
+                    if text:
+                        self._prompt_tail = " ".join(text.split()[-PROMPT_TAIL_WORDS:])
+                        self._handle_transcription(text.lower())
+            except Exception as e:
+                self.logger.error(f"Error transcribing audio: {e}")
+            
+            with self._infer_lock:
+                clips = list(self._pending_clips)
+                self._pending_clips.clear()
+                if not clips:
+                    self._infer_busy = False
+    
+    def _log_mel_spectrogram(self, audio: "torch.Tensor") -> "torch.Tensor":
+        """whisper.log_mel_spectrogram for a (batch, samples) tensor, using the cached filters and window"""
+        stft = torch.stft(
+            audio, whisper.audio.N_FFT, whisper.audio.HOP_LENGTH,
+            window=self._hann, return_complex=True
+        )
+        magnitudes = stft[..., :-1].abs() ** 2
+        log_spec = torch.clamp(self._mel_filters @ magnitudes, min=1e-10).log10()
+        # Dynamic range is clamped per clip, as if each were its own call
+        log_spec = torch.maximum(log_spec, log_spec.amax(dim=(-2, -1), keepdim=True) - 8.0)
+        return (log_spec + 4.0) / 4.0
+    
+    def _transcribe_clips(self, clips: List[np.ndarray]) -> List[str]:
+        """Transcribe windows in order, encoded and decoded as one batch"""
+        model = self.whisper_model_obj
+        
+        # Silence-padded to one 30-s segment each, as transcribe() pads its input.
+        # At most MAX_BATCH_CLIPS arrive: one submitted plus the bounded backlog
+        audio = self._audio_buf[:len(clips)]
+        for row, clip in zip(audio, clips):
+            n = min(clip.size, whisper.audio.N_SAMPLES)
+            row[:n].copy_(torch.from_numpy(clip[:n]), non_blocking=True)
+            row[n:].zero_()
+        
+        results = whisper.decode(model, self._log_mel_spectrogram(audio), whisper.DecodingOptions(
+            language="en",
+            task="transcribe",
+            fp16=self._fp16,
+            # Carry context across window boundaries
+            prompt=self._prompt_tail or None,
+            without_timestamps=True
+        ))
+        return [
+            "" if (result.no_speech_prob > NO_SPEECH_THRESHOLD
+                   and result.avg_logprob <= LOGPROB_THRESHOLD) else result.text.strip()
+            for result in results
+        ]
+    
     def _handle_transcription(self, text: str):
         """Handle transcribed text"""
         self.logger.debug(f"Transcribed: {text}")
         
         # Check for wake word
         if not self.is_wake_word_detected:
-            if self.wake_word in text:
+            if self._wake_re.search(text):
                 self.is_wake_word_detected = True
                 self.logger.info(f"Wake word '{self.wake_word}' detected!")
                 if self.wake_word_callback:
-                    asyncio.create_task(self._call_wake_word_callback())
+                    self._post_result("wake", None)
                 return
         else:
             # We're in command mode - process the command
             if text and len(text.strip()) > 2:  # Ignore very short utterances
                 self.logger.info(f"Command received: {text}")
                 if self.command_callback:
-                    asyncio.create_task(self._call_command_callback(text))
+                    self._post_result("command", text)
                 # Reset wake word state after processing command
                 self.is_wake_word_detected = False
     
+    def _post_result(self, kind: str, text: Optional[str]):
+        """Inference thread: queue a result for the dispatcher on the event loop"""
+        result_q = self._result_q
+        if result_q is not None:
+            self._loop.call_soon_threadsafe(result_q.put_nowait, (kind, text))
+    
+    async def _dispatch_loop(self):
+        """Run callbacks for queued results, in order, until the stop sentinel"""
+        result_q = self._result_q
+        while True:
+            kind, text = await result_q.get()
+            if kind == "stop":
+                return
+            if kind == "wake":
+                await self._call_wake_word_callback()
+            elif kind == "command":
+                await self._call_command_callback(text)
+    
     async def _call_wake_word_callback(self):
         """Safely call wake word callback"""
         try:
@@ -323,10 +668,6 @@ class SpeechRecognitionManager:
         if self.audio:
             self.audio.terminate()
         
-        if self.engine == SpeechEngine.WINDOWS_NATIVE and WINDOWS_SPEECH_AVAILABLE:
-            try:
-                pythoncom.CoUninitialize()
-            except:
-                pass
+        self._infer_pool.shutdown(wait=False)
         
         self.logger.info("Speech recognition cleaned up")
\ No newline at end of file
@@ -1,9 +1,13 @@
 import asyncio
+import json
 import logging
-import io
-import wave
+import os
+import struct
+import time
 import pyaudio
 import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 from typing import Optional, Callable
 import aiohttp
@@ -15,6 +19,25 @@ except ImportError:
     SPEECH_RECOGNITION_AVAILABLE = False
     sr = None
 
+WAV_HEADER_SIZE = 44
+
+# Ambient-noise calibration is saved here and reused for up to a week
+CALIBRATION_CACHE = (
+    Path(os.getenv("LOCALAPPDATA") or Path.home() / ".cache")
+    / "WindowsAIAssistant" / "energy_threshold.json"
+)
+CALIBRATION_MAX_AGE = 7 * 24 * 3600
+
+def build_wav_header(rate: int, channels: int, sample_width: int, data_len: int) -> bytes:
+    """Canonical 44-byte PCM WAV header for data_len bytes of samples"""
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_len, b"WAVE",
+        b"fmt ", 16, 1, channels, rate, rate * channels * sample_width,
+        channels * sample_width, sample_width * 8,
+        b"data", data_len
+    )
+
 class SpeechRecognizer(ABC):
     """Abstract base class for speech recognition"""
     
@@ -49,42 +72,89 @@ class WindowsSpeechRecognizer(SpeechRecognizer):
         self.microphone = sr.Microphone()
         self.listening = False
         self.logger = logging.getLogger(__name__)
+        # Set in start_listening: blocking listen/recognize calls run on a
+        # private pool so other default-executor work can't starve them
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._exec: Optional[ThreadPoolExecutor] = None
+        # The microphone is a single-entry context manager shared by pool threads
+        self._mic_lock = threading.Lock()
         
-        # Adjust for ambient noise
-        with self.microphone as source:
+        # Adjust for ambient noise, unless a recent calibration is cached
+        if not self._load_calibration():
+            self._calibrate()
+    
+    def _load_calibration(self) -> bool:
+        """Apply a cached energy threshold if one exists and is still fresh"""
+        try:
+            cached = json.loads(CALIBRATION_CACHE.read_text())
+            if time.time() - cached["computed_at"] >= CALIBRATION_MAX_AGE:
+                return False
+            self.recognizer.energy_threshold = float(cached["energy_threshold"])
+            self.recognizer.dynamic_energy_threshold = cached.get("dynamic_energy_threshold", False)
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        self.logger.info(f"Using cached energy threshold {self.recognizer.energy_threshold:.0f}")
+        return True
+    
+    def _calibrate(self) -> None:
+        """Measure ambient noise and cache the resulting threshold (blocking, ~1 s)"""
+        with self._mic_lock, self.microphone as source:
             self.recognizer.adjust_for_ambient_noise(source)
+        # A fixed threshold, so the cached value is the one actually used
+        self.recognizer.dynamic_energy_threshold = False
+        
+        try:
+            CALIBRATION_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            CALIBRATION_CACHE.write_text(json.dumps({
+                "energy_threshold": self.recognizer.energy_threshold,
+                "dynamic_energy_threshold": False,
+                "computed_at": time.time()
+            }))
+        except OSError as e:
+            self.logger.warning(f"Could not cache energy threshold: {e}")
+    
+    async def recalibrate(self) -> None:
+        """Re-measure ambient noise, e.g. after the room or microphone changes"""
+        loop = self._loop or asyncio.get_running_loop()
+        await loop.run_in_executor(self._exec, self._calibrate)
+        self.logger.info(f"Recalibrated energy threshold to {self.recognizer.energy_threshold:.0f}")
     
     async def start_listening(self) -> None:
         """Start listening service"""
+        self._loop = asyncio.get_running_loop()
+        self._exec = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stt")
         self.listening = True
         self.logger.info("Windows Speech Recognition started")
     
     async def stop_listening(self) -> None:
         """Stop listening service"""
         self.listening = False
+        if self._exec:
+            self._exec.shutdown(wait=False)
+            self._exec = None
         self.logger.info("Windows Speech Recognition stopped")
     
+    def _listen_blocking(self, timeout: float, phrase_time_limit: float) -> "sr.AudioData":
+        """Open the microphone and capture one phrase (blocking; run on the stt pool)"""
+        with self._mic_lock, self.microphone as source:
+            return self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+    
     async def listen_for_wake_word(self, wake_word: str, callback: Callable) -> None:
         """Listen continuously for wake word"""
         self.logger.info(f"Listening for wake word: '{wake_word}'")
+        wake_word_cf = wake_word.casefold()
+        # Without start_listening, calls fall back to the loop's default executor
+        loop = self._loop or asyncio.get_running_loop()
         
         while self.listening:
             try:
-                # Listen for audio
-                with self.microphone as source:
-                    # Listen for audio with timeout
-                    audio = await asyncio.get_event_loop().run_in_executor(
-                        None, 
-                        lambda: self.recognizer.listen(source, timeout=1, phrase_time_limit=3)
-                    )
+                # Listen for audio with timeout
+                audio = await loop.run_in_executor(self._exec, self._listen_blocking, 1, 3)
                 
                 # Recognize speech
-                text = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: self.recognizer.recognize_windows(audio)
-                )
+                text = await loop.run_in_executor(self._exec, self.recognizer.recognize_windows, audio)
                 
-                if wake_word.lower() in text.lower():
+                if wake_word_cf in text.casefold():
                     self.logger.info(f"Wake word detected: '{text}'")
                     await callback()
                 
@@ -105,19 +175,13 @@ class WindowsSpeechRecognizer(SpeechRecognizer):
         """Recognize speech and return transcribed text"""
         try:
             self.logger.info("Listening for command...")
+            loop = self._loop or asyncio.get_running_loop()
             
-            with self.microphone as source:
-                # Listen for command
-                audio = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: self.recognizer.listen(source, timeout=timeout, phrase_time_limit=10)
-                )
+            # Listen for command
+            audio = await loop.run_in_executor(self._exec, self._listen_blocking, timeout, 10)
             
             # Recognize speech
-            text = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.recognizer.recognize_windows(audio)
-            )
+            text = await loop.run_in_executor(self._exec, self.recognizer.recognize_windows, audio)
             
             self.logger.info(f"Recognized: '{text}'")
             return text
@@ -147,10 +211,38 @@ class WhisperSpeechRecognizer(SpeechRecognizer):
         self.channels = 1
         self.rate = 16000
         self.p = pyaudio.PyAudio()
+        self._sample_width = self.p.get_sample_size(self.sample_format)
+        # Format fields never change; only the two size fields are patched per clip
+        self._wav_header_template = build_wav_header(self.rate, self.channels, self._sample_width, 0)
+        # Opened on first recording and kept open; reopening costs tens of ms
+        self._in_stream = None
+        # Set in start_listening; recordings block on a private pool
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._exec: Optional[ThreadPoolExecutor] = None
+        # Raw samples go to /transcribe/pcm until the server turns out not to have it
+        self._pcm_supported = True
+        self._pcm_headers = {
+            "Content-Type": "application/octet-stream",
+            "X-Sample-Rate": str(self.rate),
+            "X-Channels": str(self.channels),
+            "X-Format": "s16le"
+        }
     
     async def start_listening(self) -> None:
         """Start listening service"""
-        self.session = aiohttp.ClientSession()
+        # Every 3-s clip is a POST to the same local server: keep the
+        # connection alive between clips and fail fast if it is down
+        connector = aiohttp.TCPConnector(
+            limit=4,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=10, connect=1),
+        )
+        self._loop = asyncio.get_running_loop()
+        self._exec = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stt")
         self.listening = True
         
         # Test connection to Whisper server
@@ -168,45 +260,78 @@ class WhisperSpeechRecognizer(SpeechRecognizer):
         self.listening = False
         if self.session:
             await self.session.close()
+        if self._exec:
+            # The stream is closed below, so let a recording in progress finish
+            # first, without blocking the event loop on it
+            await self._loop.run_in_executor(None, self._exec.shutdown)
+            self._exec = None
+        if self._in_stream:
+            self._in_stream.close()
+            self._in_stream = None
         self.p.terminate()
         self.logger.info("Whisper Speech Recognition stopped")
     
-    async def record_audio(self, duration: float) -> bytes:
-        """Record audio for specified duration"""
-        stream = self.p.open(
-            format=self.sample_format,
-            channels=self.channels,
-            rate=self.rate,
-            frames_per_buffer=self.chunk,
-            input=True
-        )
+    def _record_audio_sync(self, duration: float) -> bytearray:
+        """Record audio for specified duration (blocking; run in an executor)"""
+        if self._in_stream is None:
+            self._in_stream = self.p.open(
+                format=self.sample_format,
+                channels=self.channels,
+                rate=self.rate,
+                frames_per_buffer=self.chunk,
+                input=True
+            )
+        stream = self._in_stream
+        
+        # Drop audio buffered while we were transcribing the previous clip
+        stale = stream.get_read_available()
+        if stale:
+            stream.read(stale, exception_on_overflow=False)
         
-        frames = []
         frames_to_record = int(self.rate / self.chunk * duration)
+        chunk_bytes = self.chunk * self.channels * self._sample_width
+        data_len = frames_to_record * chunk_bytes
         
+        # Each chunk is written at its offset. The first WAV_HEADER_SIZE bytes
+        # stay reserved so a WAV fallback needs no second copy of the samples
+        buf = bytearray(WAV_HEADER_SIZE + data_len)
+        offset = WAV_HEADER_SIZE
         for _ in range(frames_to_record):
-            data = stream.read(self.chunk)
-            frames.append(data)
+            buf[offset:offset + chunk_bytes] = stream.read(self.chunk, exception_on_overflow=False)
+            offset += chunk_bytes
         
-        stream.stop_stream()
-        stream.close()
-        
-        # Convert to WAV format
-        wav_buffer = io.BytesIO()
-        with wave.open(wav_buffer, 'wb') as wf:
-            wf.setnchannels(self.channels)
-            wf.setsampwidth(self.p.get_sample_size(self.sample_format))
-            wf.setframerate(self.rate)
-            wf.writeframes(b''.join(frames))
-        
-        return wav_buffer.getvalue()
+        return buf
+    
+    def _fill_wav_header(self, buf: bytearray) -> None:
+        """Write the WAV header into the reserved front of a recording buffer"""
+        data_len = len(buf) - WAV_HEADER_SIZE
+        buf[:WAV_HEADER_SIZE] = self._wav_header_template
+        struct.pack_into("<I", buf, 4, 36 + data_len)
+        struct.pack_into("<I", buf, 40, data_len)
     
-    async def transcribe_audio(self, audio_data: bytes) -> Optional[str]:
-        """Send audio to Whisper server for transcription"""
+    async def transcribe_audio(self, audio_data: bytearray) -> Optional[str]:
+        """Send a recording from _record_audio_sync to Whisper server for transcription"""
         if not self.session:
             return None
         
         try:
+            if self._pcm_supported:
+                # Samples only, as the body itself: no WAV header or multipart framing
+                async with self.session.post(
+                    f"{self.whisper_url}/transcribe/pcm",
+                    data=memoryview(audio_data)[WAV_HEADER_SIZE:],
+                    headers=self._pcm_headers
+                ) as response:
+                    if response.status == 200:
+                        result = await response.json()
+                        return result.get('text', '').strip()
+                    if response.status not in (404, 405):
+                        self.logger.error(f"Whisper transcription failed: {response.status}")
+                        return None
+                self.logger.info("Whisper server has no raw PCM endpoint, uploading WAV instead")
+                self._pcm_supported = False
+            
+            self._fill_wav_header(audio_data)
             data = aiohttp.FormData()
             data.add_field('file', audio_data, filename='audio.wav', content_type='audio/wav')
             
@@ -224,18 +349,19 @@ class WhisperSpeechRecognizer(SpeechRecognizer):
     async def listen_for_wake_word(self, wake_word: str, callback: Callable) -> None:
         """Listen continuously for wake word"""
         self.logger.info(f"Listening for wake word: '{wake_word}' using Whisper")
+        wake_word_cf = wake_word.casefold()
+        # Without start_listening, calls fall back to the loop's default executor
+        loop = self._loop or asyncio.get_running_loop()
         
         while self.listening:
             try:
                 # Record 3 seconds of audio
-                audio_data = await asyncio.get_event_loop().run_in_executor(
-                    None, lambda: asyncio.run(self.record_audio(3.0))
-                )
+                audio_data = await loop.run_in_executor(self._exec, self._record_audio_sync, 3.0)
                 
                 # Transcribe audio
                 text = await self.transcribe_audio(audio_data)
                 
-                if text and wake_word.lower() in text.lower():
+                if text and wake_word_cf in text.casefold():
                     self.logger.info(f"Wake word detected: '{text}'")
                     await callback()
                 
@@ -250,11 +376,10 @@ class WhisperSpeechRecognizer(SpeechRecognizer):
         """Recognize speech and return transcribed text"""
         try:
             self.logger.info("Recording command...")
+            loop = self._loop or asyncio.get_running_loop()
             
             # Record audio for the specified duration
-            audio_data = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: asyncio.run(self.record_audio(timeout))
-            )
+            audio_data = await loop.run_in_executor(self._exec, self._record_audio_sync, timeout)
             
             # Transcribe audio
             text = await self.transcribe_audio(audio_data)